@@ -0,0 +1,9 @@
+from django.contrib import admin
+from . import models
+
+
+@admin.register(models.OutboxMessage)
+class OutboxMessageAdmin(admin.ModelAdmin):
+    list_display = ['subject', 'status', 'attempts', 'created_at', 'next_attempt_at', 'sent_at']
+    list_filter = ['status']
+    readonly_fields = ['claim', 'locked_until', 'sent_at', 'last_error']
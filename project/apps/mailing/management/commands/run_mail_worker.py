@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from mailing.worker import MailWorker
+
+
+class Command(BaseCommand):
+    help = 'Delivers queued outbox messages.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Deliver due messages and exit.')
+        parser.add_argument('--batch-size', type=int, help='Messages claimed per batch.')
+        parser.add_argument('--interval', type=float, help='Seconds to sleep when the outbox is empty.')
+
+    def handle(self, *args, **options):
+        worker = MailWorker(batch_size=options['batch_size'])
+
+        if options['once']:
+            sent = worker.run_once()
+            self.stdout.write(self.style.SUCCESS(f'Sent {sent} messages.'))
+            return
+
+        self.stdout.write('Mail worker started.')
+        try:
+            worker.run(interval=options['interval'])
+        except KeyboardInterrupt:
+            self.stdout.write('Mail worker stopped.')
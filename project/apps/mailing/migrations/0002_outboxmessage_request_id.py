@@ -0,0 +1,18 @@
+# Generated by Django 5.1.6 on 2026-10-18 19:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mailing', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='outboxmessage',
+            name='request_id',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+    ]
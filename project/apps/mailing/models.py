@@ -0,0 +1,67 @@
+from datetime import timedelta
+
+from django.db import models
+from django.utils import timezone
+
+
+class OutboxMessage(models.Model):
+    class Status(models.TextChoices):
+        PENDING = 'pending'
+        SENDING = 'sending'
+        SENT = 'sent'
+        DEAD = 'dead'
+
+    subject = models.CharField(max_length=255, blank=True)
+    body = models.TextField()
+    from_email = models.CharField(max_length=254, blank=True)
+    to = models.JSONField(default=list)
+
+    status = models.CharField(max_length=16, choices=Status.choices, default=Status.PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    # Set while a worker holds the message, expired claims are picked up again
+    claim = models.CharField(max_length=32, blank=True)
+    locked_until = models.DateTimeField(null=True, blank=True)
+
+    # Request that queued the message, bound to log records of its delivery
+    request_id = models.CharField(max_length=64, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+        ]
+
+    def __str__(self) -> str:
+        return f'{self.subject or "(no subject)"} -> {", ".join(self.to)}'
+
+    def mark_sent(self) -> None:
+        self.status = self.Status.SENT
+        self.sent_at = timezone.now()
+        self.attempts += 1
+        self.claim = ''
+        self.locked_until = None
+        self.save(update_fields=['status', 'sent_at', 'attempts', 'claim', 'locked_until'])
+
+    def mark_failed(self, error: Exception, max_attempts: int, backoff: int) -> None:
+        """
+        Records a failed delivery attempt.
+
+        The message is scheduled again after `backoff` seconds, doubled for every
+        previous attempt, or marked as dead once `max_attempts` is reached.
+        """
+
+        self.attempts += 1
+        self.last_error = f'{type(error).__name__}: {error}'
+        if self.attempts >= max_attempts:
+            self.status = self.Status.DEAD
+        else:
+            self.status = self.Status.PENDING
+            self.next_attempt_at = timezone.now() + timedelta(seconds=backoff * 2 ** (self.attempts - 1))
+        self.claim = ''
+        self.locked_until = None
+        self.save(update_fields=['status', 'attempts', 'last_error', 'next_attempt_at', 'claim', 'locked_until'])
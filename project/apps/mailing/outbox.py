@@ -0,0 +1,51 @@
+from utils import logs, metrics
+
+from .models import OutboxMessage
+
+
+def enqueue(subject: str, body: str, to: list[str], from_email: str = '') -> OutboxMessage:
+    """
+    Stores an email in the outbox to be delivered by the mail worker.
+
+    Parameters
+    ----------
+    subject : str
+        Subject of the email.
+    body : str
+        Plain text body of the email.
+    to : list of str
+        Recipient addresses.
+    from_email : str, optional
+        Sender address, `DEFAULT_FROM_EMAIL` is used when empty (default is '').
+
+    Returns
+    -------
+    OutboxMessage
+        The queued message.
+
+    Notes
+    -----
+    - Nothing is sent from here, run `manage.py run_mail_worker` to deliver queued messages.
+    """
+
+    with metrics.timed('email'):
+        return OutboxMessage.objects.create(
+            subject=subject,
+            body=body,
+            to=list(to),
+            from_email=from_email,
+            request_id=logs.get_request_id(),
+        )
+
+
+async def aenqueue(subject: str, body: str, to: list[str], from_email: str = '') -> OutboxMessage:
+    """See enqueue()."""
+
+    with metrics.timed('email'):
+        return await OutboxMessage.objects.acreate(
+            subject=subject,
+            body=body,
+            to=list(to),
+            from_email=from_email,
+            request_id=logs.get_request_id(),
+        )
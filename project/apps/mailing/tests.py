@@ -0,0 +1,71 @@
+from datetime import timedelta
+from django.core import mail
+from django.test import TestCase
+from django.utils import timezone
+
+from .models import OutboxMessage
+from .worker import MailWorker
+
+
+class MailWorkerTests(TestCase):
+    def setUp(self):
+        self.worker = MailWorker(batch_size=10, max_attempts=3, backoff=60, lease=300)
+
+    def create_message(self, **fields) -> OutboxMessage:
+        return OutboxMessage.objects.create(subject='Subject', body='Body', to=['to@example.com'], **fields)
+
+    def test_claimed_messages_are_leased_to_one_worker(self):
+        due = self.create_message()
+        self.create_message(next_attempt_at=timezone.now() + timedelta(hours=1))
+
+        claimed = self.worker.claim_batch()
+        self.assertEqual(claimed, [due])
+        self.assertEqual(claimed[0].status, OutboxMessage.Status.SENDING)
+        self.assertGreater(claimed[0].locked_until, timezone.now())
+
+        # Held until the lease runs out
+        self.assertEqual(MailWorker(lease=300).claim_batch(), [])
+
+    def test_expired_leases_are_claimed_again(self):
+        message = self.create_message(
+            status=OutboxMessage.Status.SENDING,
+            claim='crashed-worker',
+            locked_until=timezone.now() - timedelta(seconds=1),
+        )
+
+        claimed = self.worker.claim_batch()
+        self.assertEqual(claimed, [message])
+        self.assertNotEqual(claimed[0].claim, 'crashed-worker')
+
+    def test_failures_back_off_then_go_dead(self):
+        message = self.create_message()
+
+        message.mark_failed(OSError('refused'), max_attempts=3, backoff=60)
+        self.assertEqual(message.status, OutboxMessage.Status.PENDING)
+        first_retry = message.next_attempt_at - timezone.now()
+
+        message.mark_failed(OSError('refused'), max_attempts=3, backoff=60)
+        second_retry = message.next_attempt_at - timezone.now()
+        self.assertAlmostEqual(first_retry.total_seconds(), 60, delta=5)
+        self.assertAlmostEqual(second_retry.total_seconds(), 120, delta=5)
+
+        message.mark_failed(OSError('refused'), max_attempts=3, backoff=60)
+        message.refresh_from_db()
+        self.assertEqual(message.status, OutboxMessage.Status.DEAD)
+        self.assertEqual(message.attempts, 3)
+        self.assertEqual(message.last_error, 'OSError: refused')
+
+        # Dead messages are never claimed
+        self.assertEqual(self.worker.claim_batch(), [])
+
+    def test_delivered_messages_are_marked_sent(self):
+        message = self.create_message()
+
+        self.assertEqual(self.worker.run_once(), 1)
+        self.assertEqual(len(mail.outbox), 1)
+
+        message.refresh_from_db()
+        self.assertEqual(message.status, OutboxMessage.Status.SENT)
+        self.assertIsNotNone(message.sent_at)
+        self.assertEqual(message.claim, '')
+        self.assertIsNone(message.locked_until)
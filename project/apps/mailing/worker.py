@@ -0,0 +1,156 @@
+from datetime import timedelta
+import logging
+import time
+import uuid
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db.models import Q
+from django.utils import timezone
+from utils import logs
+
+from .models import OutboxMessage
+
+
+logger = logging.getLogger(__name__)
+
+
+class MailWorker:
+    """
+    Delivers queued outbox messages in batches over a single SMTP connection.
+
+    Parameters
+    ----------
+    batch_size : int, optional
+        Maximum number of messages claimed at once (default is `MAILING_BATCH_SIZE`).
+    max_attempts : int, optional
+        Failed attempts after which a message is marked as dead (default is `MAILING_MAX_ATTEMPTS`).
+    backoff : int, optional
+        Seconds before the first retry, doubled on every next one (default is `MAILING_RETRY_BACKOFF`).
+    lease : int, optional
+        Seconds a claimed message stays reserved for this worker (default is `MAILING_LEASE`).
+    """
+
+    def __init__(self, batch_size: int = None, max_attempts: int = None, backoff: int = None, lease: int = None):
+        self.batch_size = batch_size or settings.MAILING_BATCH_SIZE
+        self.max_attempts = max_attempts or settings.MAILING_MAX_ATTEMPTS
+        self.backoff = backoff or settings.MAILING_RETRY_BACKOFF
+        self.lease = lease or settings.MAILING_LEASE
+
+
+    def claim_batch(self) -> list[OutboxMessage]:
+        """
+        Reserves due messages for this worker.
+
+        Returns
+        -------
+        list of OutboxMessage
+            Messages that were claimed, other workers will skip them until the lease expires.
+        """
+
+        now = timezone.now()
+        due = (
+            Q(status=OutboxMessage.Status.PENDING, next_attempt_at__lte=now) |
+            Q(status=OutboxMessage.Status.SENDING, locked_until__lt=now)
+        )
+        ids = list(
+            OutboxMessage.objects
+            .filter(due)
+            .order_by('next_attempt_at')
+            .values_list('pk', flat=True)[:self.batch_size]
+        )
+        if not ids:
+            return []
+
+        claim = uuid.uuid4().hex
+        OutboxMessage.objects.filter(due, pk__in=ids).update(
+            status=OutboxMessage.Status.SENDING,
+            claim=claim,
+            locked_until=now + timedelta(seconds=self.lease),
+        )
+        return list(OutboxMessage.objects.filter(claim=claim))
+
+
+    def deliver(self, messages: list[OutboxMessage], connection) -> int:
+        """
+        Sends claimed messages through an already opened connection.
+
+        Returns
+        -------
+        int
+            Number of messages that were sent.
+        """
+
+        sent = 0
+        for message in messages:
+            # Logs of the delivery carry the ID of the request that queued the message
+            with logs.bind(message.request_id):
+                email = EmailMessage(
+                    message.subject,
+                    message.body,
+                    message.from_email or None,
+                    message.to,
+                    connection=connection,
+                )
+                try:
+                    email.send()
+                except Exception as e:
+                    logger.warning('Delivery of outbox message %s failed: %s', message.pk, e)
+                    message.mark_failed(e, self.max_attempts, self.backoff)
+                    # The connection may be left in a broken state after a failure
+                    connection.close()
+                    try:
+                        connection.open()
+                    except Exception:
+                        pass
+                else:
+                    message.mark_sent()
+                    sent += 1
+        return sent
+
+
+    def run_once(self) -> int:
+        """
+        Delivers everything that is currently due, reusing one connection for all batches.
+
+        Returns
+        -------
+        int
+            Number of messages that were sent.
+        """
+
+        messages = self.claim_batch()
+        if not messages:
+            return 0
+
+        connection = get_connection()
+        try:
+            connection.open()
+        except Exception as e:
+            logger.warning('Could not connect to the mail server: %s', e)
+            for message in messages:
+                message.mark_failed(e, self.max_attempts, self.backoff)
+            return 0
+
+        sent = 0
+        try:
+            while messages:
+                sent += self.deliver(messages, connection)
+                messages = self.claim_batch()
+        finally:
+            connection.close()
+        return sent
+
+
+    def run(self, interval: float = None) -> None:
+        """
+        Polls the outbox forever, sleeping `interval` seconds when there is nothing to send.
+        """
+
+        interval = interval or settings.MAILING_POLL_INTERVAL
+        while True:
+            sent = self.run_once()
+            if sent:
+                logger.info('Sent %s outbox messages', sent)
+            else:
+                time.sleep(interval)
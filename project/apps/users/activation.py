@@ -0,0 +1,115 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.utils.encoding import force_str
+from django.utils.http import urlsafe_base64_decode
+
+from utils import replicas, usercache
+from .tokens import account_activation_token
+
+import copy
+
+
+def cache_key(uidb64: str, token: str) -> str:
+    return f'activation:{uidb64}:{token}'
+
+
+def decode_uid(uidb64: str) -> str | None:
+    try:
+        return force_str(urlsafe_base64_decode(uidb64))
+    except (TypeError, ValueError, OverflowError):
+        return None
+
+
+def check_token(user, token: str) -> bool:
+    """
+    Checks an activation token, also of links that were already used.
+
+    Tokens depend on `is_active`, so once a user is active their token no longer verifies.
+    It's checked against the user as they were before, a match means the link activated them.
+    """
+
+    if account_activation_token.check_token(user, token):
+        return True
+    if not user.is_active:
+        return False
+
+    inactive = copy.copy(user)
+    inactive.is_active = False
+    return account_activation_token.check_token(inactive, token)
+
+
+def activate(uidb64: str, token: str) -> bool:
+    """
+    Activates the user an activation link was sent to.
+
+    Parameters
+    ----------
+    uidb64 : str
+        Base64 encoded primary key of the user, from the link.
+    token : str
+        Activation token, from the link.
+
+    Returns
+    -------
+    bool
+        Whether the link is valid, also when visited again after activating the user.
+
+    Notes
+    -----
+    - Mail scanners often open links before the user does, so links of users they already
+      activated keep succeeding, see `check_token`. Verified links are also remembered in the
+      cache for `ACTIVATION_LINK_CACHE_TIMEOUT`, repeated visits are answered from there
+      without touching the database.
+    - Activation is a single conditional UPDATE, concurrent visits activate the user once.
+    """
+
+    key = cache_key(uidb64, token)
+    if cache.get(key):
+        return True
+
+    User = get_user_model()
+    uid = decode_uid(uidb64)
+    try:
+        # The token only depends on the primary key and 'is_active'. Links are often opened
+        # right after signing up, before a replica has the new user.
+        with replicas.primary():
+            user = User.objects.only('is_active').get(pk=uid) if uid else None
+    except (ValueError, User.DoesNotExist):
+        user = None
+
+    if not user or not check_token(user, token):
+        return False
+
+    # Already active users visit a used link, nothing to update
+    if not user.is_active and User.objects.filter(pk=user.pk, is_active=False).update(is_active=True):
+        # Bypasses save(), so its signal receivers don't run
+        usercache.invalidate(user.pk)
+    cache.set(key, True, settings.ACTIVATION_LINK_CACHE_TIMEOUT)
+    return True
+
+
+async def aactivate(uidb64: str, token: str) -> bool:
+    """See activate()."""
+
+    key = cache_key(uidb64, token)
+    if await cache.aget(key):
+        return True
+
+    User = get_user_model()
+    uid = decode_uid(uidb64)
+    try:
+        with replicas.primary():
+            user = await User.objects.only('is_active').aget(pk=uid) if uid else None
+    except (ValueError, User.DoesNotExist):
+        user = None
+
+    if not user or not check_token(user, token):
+        return False
+
+    if not user.is_active and await User.objects.filter(pk=user.pk, is_active=False).aupdate(is_active=True):
+        # Registers a commit hook, which needs the connection
+        await sync_to_async(usercache.invalidate)(user.pk)
+    await cache.aset(key, True, settings.ACTIVATION_LINK_CACHE_TIMEOUT)
+    return True
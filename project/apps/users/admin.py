@@ -2,4 +2,12 @@ from django.contrib import admin
 from . import models
 
 
-admin.site.register(models.User)
\ No newline at end of file
+admin.site.register(models.User)
+
+
+@admin.register(models.LoginEvent)
+class LoginEventAdmin(admin.ModelAdmin):
+    list_display = ['user', 'logged_in_at', 'ip_address']
+    list_filter = ['logged_in_at']
+    search_fields = ['user__email']
+    raw_id_fields = ['user']
\ No newline at end of file
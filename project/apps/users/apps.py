@@ -1,6 +1,21 @@
 from django.apps import AppConfig
+from django.core import checks
 
 
 class UsersConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'users'
+
+    def ready(self):
+        from . import signals
+        from .logins import record_login
+        from django.contrib.auth.signals import user_logged_in
+        # Logins are written in bulk instead
+        user_logged_in.disconnect(dispatch_uid='update_last_login')
+        user_logged_in.connect(record_login, dispatch_uid='users.record_login')
+        from utils.staticfiles import check_static_references
+        from utils.usercache import check_shared_cache
+        from utils.views import check_templates
+        checks.register(check_templates, checks.Tags.templates)
+        checks.register(check_static_references, checks.Tags.staticfiles)
+        checks.register(check_shared_cache, checks.Tags.caches)
@@ -0,0 +1,130 @@
+from asgiref.sync import sync_to_async
+from django.http import HttpRequest
+
+# Authentication
+from django.contrib import auth
+from django.contrib.auth import get_user_model
+from .backends import aauthenticate
+
+# Activation
+from django.utils.encoding import force_str
+from django.utils.http import urlsafe_base64_decode
+from .tokens import account_activation_token
+from . import activation
+
+# Views
+from django.shortcuts import redirect
+from utils.views import template_view, arender
+from utils.pagecache import anonymous_page_cache
+from . import forms
+
+# Views without native async versions
+from .views import (
+    USER_ACTIVATION_FLOW,
+    PASSWORD_RESET_FLOW,
+    logout,
+    activation_success,
+    activation_fail,
+    change_password,
+    reset_password_success,
+    reset_password_fail,
+)
+
+
+# Authentication
+@anonymous_page_cache()
+@template_view()
+async def login(request: HttpRequest, template: str):
+    if request.method == 'GET':
+        form = forms.LoginForm()
+
+    if request.method == 'POST':
+        form = forms.LoginForm(request.POST)
+        if form.is_valid():
+            user = await aauthenticate(request,
+                username=form.cleaned_data.get('email'),
+                password=form.cleaned_data.get('password'),
+            )
+            if user:
+                await auth.alogin(request, user)
+                next_url = request.GET.get('next')
+                if next_url:
+                    return redirect(next_url)
+                return redirect('/users')
+
+    return await arender(request, template, {
+        'form': form
+    })
+
+
+
+# Activation
+@anonymous_page_cache()
+@template_view()
+async def register(request: HttpRequest, template: str):
+    if request.method == 'GET':
+        form = forms.RegisterForm()
+
+    if request.method == 'POST':
+        form = forms.RegisterForm(request.POST)
+        # Validation checks for existing usernames and emails
+        if await sync_to_async(form.is_valid)():
+            await form.asend_email_activation(request)
+            await USER_ACTIVATION_FLOW.astart(request)
+            return redirect('users:login')
+
+    return await arender(request, template, {
+        'form': form
+    })
+
+
+async def activation_activate(request: HttpRequest, uidb64: str, token: str):
+    if await activation.aactivate(uidb64, token):
+        return redirect('users:activation_success')
+    return redirect('users:activation_fail')
+
+
+
+# Password management
+@anonymous_page_cache()
+@template_view()
+async def reset_password(request: HttpRequest, template: str):
+    if request.method == 'GET':
+        form = forms.PasswordResetForm()
+
+    if request.method == 'POST':
+        form = forms.PasswordResetForm(request.POST)
+        if form.is_valid():
+            await form.asend_password_reset(request)
+            await PASSWORD_RESET_FLOW.astart(request)
+            return redirect('users:login')
+
+    return await arender(request, template, {
+        'form': form,
+    })
+
+
+@template_view()
+async def reset_password_reset(request: HttpRequest, uidb64: str, token: str, template: str):
+    User = get_user_model()
+
+    try:
+        uid = force_str(urlsafe_base64_decode(uidb64))
+        user = await User.objects.aget(pk=uid)
+    except(TypeError, ValueError, OverflowError, User.DoesNotExist):
+        user = None
+
+    if request.method == 'GET':
+        form = forms.ChangePasswordForm(user)
+
+    if request.method == 'POST':
+        if user and account_activation_token.check_token(user, token):
+            form = forms.ChangePasswordForm(user, request.POST)
+            if form.is_valid():
+                await form.asave()
+                return redirect('users:reset_password_success')
+        return redirect('users:reset_password_fail')
+
+    return await arender(request, template, {
+        'form': form,
+    })
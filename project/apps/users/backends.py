@@ -1,15 +1,71 @@
-from django.contrib.auth import get_user_model
+from django.conf import settings
+from django.contrib.auth import get_user_model, load_backend
 from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.signals import user_login_failed
+from asgiref.sync import sync_to_async
+from utils import usercache
+from . import hashing
 
 
 class EmailBackend(ModelBackend):
     def authenticate(self, request, username=None, password=None, **kwargs):
         UserModel = get_user_model()
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
         try:
-            user = UserModel.objects.get(email=username)
+            user = UserModel.objects.by_email(username).get()
         except UserModel.DoesNotExist:
+            # Hash the password anyway, so unknown emails take as long as wrong passwords
+            UserModel().set_password(password)
             return None
         else:
             if user.check_password(password):
                 return user
-        return None
\ No newline at end of file
+        return None
+
+    async def aauthenticate(self, request, username=None, password=None, **kwargs):
+        UserModel = get_user_model()
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        try:
+            user = await UserModel.objects.by_email(username).aget()
+        except UserModel.DoesNotExist:
+            await hashing.amake_password(password)
+            return None
+        else:
+            if await user.acheck_password(password):
+                return user
+        return None
+
+    def get_user(self, user_id):
+        # Runs for every authenticated request, see 'utils.usercache'
+        user = usercache.get_user(user_id)
+        return user if user and self.user_can_authenticate(user) else None
+
+
+async def aauthenticate(request=None, **credentials):
+    """
+    Async counterpart of `django.contrib.auth.authenticate`.
+
+    Django's own `aauthenticate` runs `authenticate` in a thread, this one awaits
+    the native `aauthenticate` of backends that define it.
+    """
+
+    for backend_path in settings.AUTHENTICATION_BACKENDS:
+        backend = load_backend(backend_path)
+        if hasattr(backend, 'aauthenticate'):
+            user = await backend.aauthenticate(request, **credentials)
+        else:
+            user = await sync_to_async(backend.authenticate)(request, **credentials)
+
+        if user is not None:
+            user.backend = backend_path
+            return user
+
+    await user_login_failed.asend(
+        sender=__name__, credentials={'username': credentials.get('username')}, request=request
+    )
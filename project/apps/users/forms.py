@@ -1,8 +1,10 @@
+from asgiref.sync import sync_to_async
+from django.db import transaction
 from django.http import HttpRequest
-from . import models
+from . import models, hashing
 
 # Mailing
-from django.core.mail import EmailMessage
+from mailing import outbox
 from django.contrib.auth import get_user_model
 from django.utils.encoding import force_bytes
 from django.utils.http import urlsafe_base64_encode
@@ -16,6 +18,20 @@ from django.contrib.auth.forms import UserCreationForm, SetPasswordForm, Passwor
 from django.contrib.auth import get_user_model
 
 
+ACTIVATION_SUBJECT = 'Activate your account'
+RESET_PASSWORD_SUBJECT = 'Reset your password'
+
+
+def render_email(template_name: str, request: HttpRequest, user: models.User) -> str:
+    return render_to_string(template_name, {
+        'user': user,
+        'domain': get_current_site(request).domain,
+        'uid': urlsafe_base64_encode(force_bytes(user.pk)),
+        'token': tokens.account_activation_token.make_token(user),
+        'protocol': 'https' if request.is_secure() else 'http',
+    })
+
+
 class LoginForm(forms.Form):
     email = forms.EmailField()
     password = forms.CharField(widget=forms.PasswordInput)
@@ -32,47 +48,80 @@ class RegisterForm(UserCreationForm):
             'password1',
             'password2'
         ]
+
+    def validate_unique(self):
+        # The unique check of 'email' is case-sensitive, the one of 'normalized_email' isn't
+        exclude = self._get_validation_exclusions() | {'email'}
+        if 'email' in self._errors:
+            exclude.add('normalized_email')
+        else:
+            exclude.discard('normalized_email')
+            self.instance.normalized_email = models.normalize_email(self.instance.email)
+
+        try:
+            self.instance.validate_unique(exclude=exclude)
+        except forms.ValidationError as e:
+            errors = e.update_error_dict({})
+            if 'normalized_email' in errors:
+                errors.setdefault('email', []).extend(errors.pop('normalized_email'))
+            self._update_errors(forms.ValidationError(errors))
     
     def send_email_activation(self, request: HttpRequest,) -> models.User:
         user = self.save(commit=False)
-        user.is_active = False
-        user.save()
-
-        subject = '' # TODO: Add subject
-        message = render_to_string('users/activation-email.html', {
-            'user': user,
-            'domain': get_current_site(request).domain,
-            'uid': urlsafe_base64_encode(force_bytes(user.pk)),
-            'token': tokens.account_activation_token.make_token(user),
-            'protocol': 'https' if request.is_secure() else 'http',
-        })
-        to_email = self.cleaned_data.get('email')
-        email = EmailMessage(subject, message, to=[to_email])
-        email.send()
+        self.save_inactive(request, user)
+        return user
 
+    async def asend_email_activation(self, request: HttpRequest) -> models.User:
+        # Hashes the password, which may wait for the hashing pool
+        user = await sync_to_async(self.save)(commit=False)
+        # Transactions can't span awaits, so the writes run in a thread
+        await sync_to_async(self.save_inactive)(request, user)
         return user
 
+    def save_inactive(self, request: HttpRequest, user: models.User) -> None:
+        """Saves `user` inactive and queues their activation email, both or neither."""
+
+        user.is_active = False
+        # No savepoint, a failure rolls back the enclosing transaction anyway
+        with transaction.atomic(savepoint=False):
+            user.save()
+
+            subject = ACTIVATION_SUBJECT
+            message = render_email('users/activation-email.html', request, user)
+            to_email = self.cleaned_data.get('email')
+            outbox.enqueue(subject, message, to=[to_email])
+
 
 class ChangePasswordForm(SetPasswordForm):
     class Meta:
         model = get_user_model()
         fields = ['new_password1', 'new_password2']
 
+    async def asave(self) -> models.User:
+        password = self.cleaned_data['new_password1']
+        self.user.password = await hashing.amake_password(password)
+        self.user._password = password
+        await self.user.asave()
+        return self.user
+
 
 class PasswordResetForm(PasswordResetForm):
     def send_password_reset(self, request: HttpRequest) -> None:
         email = self.cleaned_data.get('email')
-        user = get_user_model().objects.filter(email=email).first()
+        user = get_user_model().objects.by_email(email).first()
         if user:
-            subject = '' # TODO: Add subject
-            message = render_to_string('users/reset-password-email.html', {
-                'user': user,
-                'domain': get_current_site(request).domain,
-                'uid': urlsafe_base64_encode(force_bytes(user.pk)),
-                'token': tokens.account_activation_token.make_token(user),
-                'protocol': 'https' if request.is_secure() else 'http',
-            })
-            email = EmailMessage(subject, message, to=[email])
-            email.send()
+            subject = RESET_PASSWORD_SUBJECT
+            message = render_email('users/reset-password-email.html', request, user)
+            outbox.enqueue(subject, message, to=[email])
         
+        return user
+
+    async def asend_password_reset(self, request: HttpRequest) -> None:
+        email = self.cleaned_data.get('email')
+        user = await get_user_model().objects.by_email(email).afirst()
+        if user:
+            subject = RESET_PASSWORD_SUBJECT
+            message = render_email('users/reset-password-email.html', request, user)
+            await outbox.aenqueue(subject, message, to=[email])
+
         return user
\ No newline at end of file
@@ -0,0 +1,209 @@
+from concurrent.futures import Future, ProcessPoolExecutor
+from django.conf import settings
+from django.contrib.auth import hashers
+from utils import metrics
+
+import asyncio
+import os
+import threading
+
+
+def init_worker(settings_module: str) -> None:
+    # Processes started with 'spawn' or 'forkserver' begin without configured settings
+    if settings_module:
+        os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
+
+    import django
+    django.setup()
+
+
+class HashingExecutor:
+    """
+    Bounded process pool running password hashing off the request thread.
+
+    Parameters
+    ----------
+    workers : int
+        Number of worker processes.
+    max_pending : int
+        Maximum number of queued and running jobs, further submissions wait for a free slot.
+
+    Notes
+    -----
+    - The pool is created lazily in every process, so it's safe to import before a server forks its workers.
+    """
+
+    def __init__(self, workers: int, max_pending: int):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.pending = 0
+        self.completed = 0
+
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pid = None
+
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    initializer=init_worker,
+                    initargs=(os.environ.get('DJANGO_SETTINGS_MODULE', ''),),
+                )
+                self._pid = os.getpid()
+            return self._executor
+
+
+    def _done(self, future: Future) -> None:
+        with self._lock:
+            self.pending -= 1
+            self.completed += 1
+        self._slots.release()
+
+
+    def _submit(self, fn, *args) -> Future:
+        with self._lock:
+            self.pending += 1
+        try:
+            future = self._get_executor().submit(fn, *args)
+        except BaseException:
+            with self._lock:
+                self.pending -= 1
+            self._slots.release()
+            raise
+        future.add_done_callback(self._done)
+        return future
+
+
+    def run(self, fn, *args):
+        self._slots.acquire()
+        return self._submit(fn, *args).result()
+
+
+    async def arun(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            # Wait for a free slot without blocking the event loop
+            acquiring = asyncio.ensure_future(asyncio.to_thread(self._slots.acquire))
+            try:
+                await asyncio.shield(acquiring)
+            except asyncio.CancelledError:
+                # The thread takes the slot anyway, e.g. after the client disconnected
+                acquiring.add_done_callback(self._release_acquired)
+                raise
+        return await asyncio.wrap_future(self._submit(fn, *args))
+
+
+    def _release_acquired(self, acquiring: asyncio.Future) -> None:
+        if not acquiring.cancelled() and acquiring.exception() is None:
+            self._slots.release()
+
+
+    def stats(self) -> dict[str, int]:
+        return {
+            'workers': self.workers,
+            'max_pending': self.max_pending,
+            'pending': self.pending,
+            'completed': self.completed,
+        }
+
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor() -> HashingExecutor | None:
+    """
+    Returns the shared hashing executor.
+
+    Returns
+    -------
+    HashingExecutor or None
+        The executor, or None when `PASSWORD_HASHING_WORKERS` is 0 and hashing runs on the calling thread.
+    """
+
+    global _executor
+
+    if not settings.PASSWORD_HASHING_WORKERS:
+        return None
+
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = HashingExecutor(
+                    workers=settings.PASSWORD_HASHING_WORKERS,
+                    max_pending=settings.PASSWORD_HASHING_MAX_PENDING,
+                )
+    return _executor
+
+
+def stats() -> dict[str, int]:
+    """Returns queue depth metrics of the hashing executor, empty when it's disabled."""
+
+    executor = get_executor()
+    return executor.stats() if executor else {}
+
+
+metrics.register('password_hashing_pending', 'gauge', lambda: stats().get('pending'))
+metrics.register('password_hashing_max_pending', 'gauge', lambda: stats().get('max_pending'))
+metrics.register('password_hashing_completed_total', 'counter', lambda: stats().get('completed'))
+
+
+def make_password(password: str | None) -> str:
+    """See `django.contrib.auth.hashers.make_password`."""
+
+    executor = get_executor()
+    with metrics.timed('hash'):
+        # Unusable passwords don't hash anything
+        if executor is None or password is None:
+            return hashers.make_password(password)
+        return executor.run(hashers.make_password, password)
+
+
+async def amake_password(password: str | None) -> str:
+    """See make_password()."""
+
+    executor = get_executor()
+    with metrics.timed('hash'):
+        if executor is None or password is None:
+            return hashers.make_password(password)
+        return await executor.arun(hashers.make_password, password)
+
+
+def check_password(password: str, encoded: str, setter=None) -> bool:
+    """See `django.contrib.auth.hashers.check_password`."""
+
+    executor = get_executor()
+    with metrics.timed('hash'):
+        if executor is None:
+            is_correct, must_update = hashers.verify_password(password, encoded)
+        else:
+            is_correct, must_update = executor.run(hashers.verify_password, password, encoded)
+
+    if setter and is_correct and must_update:
+        setter(password)
+    return is_correct
+
+
+async def acheck_password(password: str, encoded: str, setter=None) -> bool:
+    """See check_password()."""
+
+    executor = get_executor()
+    with metrics.timed('hash'):
+        if executor is None:
+            is_correct, must_update = hashers.verify_password(password, encoded)
+        else:
+            is_correct, must_update = await executor.arun(hashers.verify_password, password, encoded)
+
+    if setter and is_correct and must_update:
+        await setter(password)
+    return is_correct
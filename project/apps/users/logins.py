@@ -0,0 +1,186 @@
+"""
+Login history and `last_login` updates, written in bulk.
+
+Replaces Django's `update_last_login` receiver of `user_logged_in`. Every login is
+recorded by `buffer`, which writes one `last_login` update per user in a single flush,
+and with `LOGIN_HISTORY` on a `LoginEvent` row per login. Without history and
+write-behind, a login costs the same single UPDATE as Django's receiver.
+
+With `LOGIN_WRITE_BEHIND` on, logins are kept in memory and flushed by a background
+thread every `LOGIN_FLUSH_INTERVAL` seconds or once `LOGIN_FLUSH_MAX_EVENTS` are pending,
+so logging in doesn't wait for a database write. Logins of the last interval are lost
+when the process is killed, they're flushed on regular exits. Without it, every login
+is flushed right away.
+"""
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import DEFAULT_DB_ALIAS, connection, models, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Coalesce, Greatest
+from django.http import HttpRequest
+from django.utils import timezone
+
+from .models import LoginEvent
+
+import atexit
+import logging
+import os
+import threading
+
+
+logger = logging.getLogger(__name__)
+
+
+class LoginBuffer:
+    """
+    Collects logins and writes them in bulk.
+
+    Parameters
+    ----------
+    history : bool
+        Whether every login is kept as a `LoginEvent`.
+    write_behind : bool
+        Whether logins wait for the background flush, otherwise `add` flushes right away.
+    interval : float
+        Seconds between background flushes.
+    max_events : int
+        Pending logins that trigger a flush before the interval is over.
+    """
+
+    def __init__(self, history: bool, write_behind: bool, interval: float, max_events: int):
+        self.history = history
+        self.write_behind = write_behind
+        self.interval = interval
+        self.max_events = max_events
+        self.dropped = 0
+
+        self._events: list[LoginEvent] = []
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._pid = None
+
+
+    def _ensure_thread(self) -> None:
+        # Started lazily in every process, so it's safe to import before a server forks
+        if self._pid == os.getpid():
+            return
+
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._events = []
+            self._pid = os.getpid()
+            threading.Thread(target=self._run, name='login-flush', daemon=True).start()
+            atexit.register(self.flush)
+
+    def _run(self) -> None:
+        while True:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            finally:
+                # The thread's connection would otherwise stay open between flushes
+                connection.close()
+
+
+    def add(self, user, request: HttpRequest = None) -> None:
+        """Records a login of `user`, made by `request` when given."""
+
+        event = LoginEvent(user_id=user.pk, logged_in_at=timezone.now())
+        # Like Django's receiver, the logged in instance is up to date right away
+        user.last_login = event.logged_in_at
+        if request is not None:
+            event.ip_address = request.META.get('REMOTE_ADDR') or None
+            event.user_agent = request.headers.get('User-Agent', '')[:255]
+
+        if not self.write_behind:
+            # Without a savepoint, which would add two queries when already in a transaction
+            with transaction.atomic(savepoint=False):
+                self.write([event])
+            return
+
+        self._ensure_thread()
+        with self._lock:
+            self._events.append(event)
+            pending = len(self._events)
+        if pending >= self.max_events:
+            self._wakeup.set()
+
+    def flush(self) -> int:
+        """
+        Writes pending logins.
+
+        Returns
+        -------
+        int
+            Number of logins written.
+        """
+
+        with self._lock:
+            events, self._events = self._events, []
+        if not events:
+            return 0
+
+        try:
+            if self.history:
+                # Users deleted since logging in would fail the whole batch. Read from the
+                # primary, a replica may not have users that signed up moments ago.
+                existing = set(
+                    get_user_model().objects.using(DEFAULT_DB_ALIAS)
+                    .filter(pk__in={event.user_id for event in events})
+                    .values_list('pk', flat=True)
+                )
+                events = [event for event in events if event.user_id in existing]
+            with transaction.atomic():
+                self.write(events)
+        except Exception:
+            # Retrying could pile up logins forever while the database is down
+            self.dropped += len(events)
+            logger.exception('Dropped %d logins that could not be written.', len(events))
+            return 0
+        return len(events)
+
+    def write(self, events: list[LoginEvent]) -> None:
+        """
+        Sets `last_login` of each user to its latest login, and inserts `events` when keeping history.
+
+        `last_login` never goes back, other processes may have written a later login since.
+        """
+
+        # Repeated logins of a user become a single update
+        latest = {}
+        for event in events:
+            if event.user_id not in latest or event.logged_in_at > latest[event.user_id]:
+                latest[event.user_id] = event.logged_in_at
+
+        User = get_user_model()
+        if self.history:
+            LoginEvent.objects.bulk_create(events)
+        User.objects.bulk_update(
+            [User(pk=pk, last_login=latest_login(logged_in_at)) for pk, logged_in_at in latest.items()],
+            ['last_login'],
+        )
+
+
+def latest_login(logged_in_at) -> Greatest:
+    """Returns the later of the stored `last_login` and `logged_in_at`."""
+
+    value = Value(logged_in_at, output_field=models.DateTimeField())
+    # GREATEST is NULL on some databases when either argument is
+    return Greatest(Coalesce(F('last_login'), value), value)
+
+
+buffer = LoginBuffer(
+    history=settings.LOGIN_HISTORY,
+    write_behind=settings.LOGIN_WRITE_BEHIND,
+    interval=settings.LOGIN_FLUSH_INTERVAL,
+    max_events=settings.LOGIN_FLUSH_MAX_EVENTS,
+)
+
+
+def record_login(sender, request, user, **kwargs):
+    """`user_logged_in` receiver replacing `django.contrib.auth.models.update_last_login`."""
+
+    buffer.add(user, request)
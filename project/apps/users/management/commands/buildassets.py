@@ -0,0 +1,213 @@
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+import glob
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+
+
+# Preamble giving every stylesheet and partial access to the shared modules in 'project/sass',
+# added to copies compiled from a temporary directory so sources stay untouched
+SASS_IMPORT = '@use "sass" as *;'
+SASS_OPTIONS = ['--style=expanded', '--no-source-map']
+
+
+def file_hash(path: str) -> str:
+    with open(path, 'rb') as file:
+        return hashlib.sha256(file.read()).hexdigest()
+
+
+class Command(BaseCommand):
+    help = (
+        'Compiles every static/*/scss directory into its sibling styles directory, '
+        'rebuilding only stylesheets whose inputs changed.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Rebuild everything.')
+        parser.add_argument('--jobs', type=int, default=os.cpu_count(), help='Stylesheets compiled in parallel.')
+        parser.add_argument('--sass', help='Path to the sass executable, looked up in node_modules and PATH by default.')
+        parser.add_argument('--watch', action='store_true', help='Keep rebuilding when inputs change.')
+        parser.add_argument('--interval', type=float, default=0.5, help='Seconds between checks in watch mode.')
+
+    def handle(self, *args, **options):
+        self.sass = options['sass'] or self.find_sass()
+        self.jobs = max(1, options['jobs'])
+        self.modules_dir = os.path.join(settings.BASE_DIR, 'sass')
+        self.manifest_path = os.path.join(settings.BASE_DIR, 'static', '.assets-manifest.json')
+
+        if not options['watch']:
+            if not self.build(options['force']):
+                raise CommandError('Some stylesheets failed to compile.')
+            return
+
+        self.stdout.write('Watching for changes, press CTRL+C to stop.')
+        snapshot = None
+        force = options['force']
+        try:
+            while True:
+                current = self.snapshot()
+                if current != snapshot:
+                    # Failures are reported and retried on the next change
+                    self.build(force)
+                    force = False
+                    snapshot = self.snapshot()
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
+
+
+    def find_sass(self) -> str:
+        local = os.path.join(settings.BASE_DIR.parent, 'node_modules', '.bin', 'sass')
+        sass = shutil.which(local) or shutil.which('sass')
+        if not sass:
+            raise CommandError('sass not found, run "npm install" or pass --sass.')
+        return sass
+
+    def scss_dirs(self) -> list[str]:
+        return sorted(glob.glob(os.path.join(settings.BASE_DIR, 'static', '*', 'scss')))
+
+    def stylesheets(self) -> list[tuple[str, str]]:
+        """Returns (source, target) pairs, partials starting with '_' are only compiled as imports."""
+
+        pairs = []
+        for scss_dir in self.scss_dirs():
+            styles_dir = os.path.join(os.path.dirname(scss_dir), 'styles')
+            for source in sorted(glob.glob(os.path.join(scss_dir, '*.scss'))):
+                name = os.path.basename(source)
+                if not name.startswith('_'):
+                    pairs.append((source, os.path.join(styles_dir, name[:-len('.scss')] + '.css')))
+        return pairs
+
+    def snapshot(self) -> dict[str, tuple[float, int]]:
+        paths = glob.glob(os.path.join(self.modules_dir, '**', '*.scss'), recursive=True)
+        for scss_dir in self.scss_dirs():
+            paths += glob.glob(os.path.join(scss_dir, '*.scss'))
+
+        snapshot = {}
+        for path in paths:
+            stat = os.stat(path)
+            snapshot[path] = (stat.st_mtime, stat.st_size)
+        return snapshot
+
+
+    def mirror(self, scss_dir: str, workdir: str) -> str:
+        """Copies stylesheets and partials of `scss_dir` into `workdir` with the preamble, returns the copy's directory."""
+
+        mirror_dir = os.path.join(workdir, os.path.relpath(scss_dir, settings.BASE_DIR))
+        os.makedirs(mirror_dir)
+        for source in glob.glob(os.path.join(scss_dir, '*.scss')):
+            with open(source, encoding='utf-8') as file:
+                content = file.read()
+            # Sources rewritten by the former import script already start with it
+            if not content.startswith(SASS_IMPORT):
+                content = f'{SASS_IMPORT}\n{content}'
+            with open(os.path.join(mirror_dir, os.path.basename(source)), 'w', encoding='utf-8') as file:
+                file.write(content)
+        return mirror_dir
+
+    def input_hash(self, source: str, shared: str) -> str:
+        """Hashes a stylesheet with everything it may import and the compiler options."""
+
+        digest = hashlib.sha256()
+        digest.update(' '.join([SASS_IMPORT, *SASS_OPTIONS]).encode())
+        digest.update(shared.encode())
+        digest.update(file_hash(source).encode())
+        # Partials next to the stylesheet
+        for partial in sorted(glob.glob(os.path.join(os.path.dirname(source), '_*.scss'))):
+            digest.update(file_hash(partial).encode())
+        return digest.hexdigest()
+
+    def shared_hash(self) -> str:
+        digest = hashlib.sha256()
+        for path in sorted(glob.glob(os.path.join(self.modules_dir, '**', '*.scss'), recursive=True)):
+            digest.update(os.path.relpath(path, self.modules_dir).encode())
+            digest.update(file_hash(path).encode())
+        return digest.hexdigest()
+
+    def load_manifest(self) -> dict[str, str]:
+        try:
+            with open(self.manifest_path) as file:
+                return json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def save_manifest(self, manifest: dict[str, str]) -> None:
+        with open(self.manifest_path + '.tmp', 'w') as file:
+            json.dump(manifest, file, indent=2, sort_keys=True)
+        os.replace(self.manifest_path + '.tmp', self.manifest_path)
+
+
+    def compile(self, source: str, target: str) -> subprocess.CompletedProcess:
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        return subprocess.run(
+            [self.sass, f'--load-path={self.modules_dir}', *SASS_OPTIONS, source, target],
+            capture_output=True, text=True,
+        )
+
+    def build(self, force: bool = False) -> bool:
+        """
+        Compiles changed stylesheets.
+
+        Returns
+        -------
+        bool
+            Whether every stylesheet compiled.
+        """
+
+        started = time.perf_counter()
+        manifest = self.load_manifest()
+        shared = self.shared_hash()
+
+        pending = []
+        for source, target in self.stylesheets():
+            key = os.path.relpath(target, settings.BASE_DIR)
+            digest = self.input_hash(source, shared)
+            if force or manifest.get(key) != digest or not os.path.exists(target):
+                pending.append((source, target, key, digest))
+
+        if not pending:
+            self.stdout.write('Stylesheets are up to date.')
+            return True
+
+        with tempfile.TemporaryDirectory() as workdir:
+            mirrors = {}
+            for source, *_ in pending:
+                scss_dir = os.path.dirname(source)
+                if scss_dir not in mirrors:
+                    mirrors[scss_dir] = self.mirror(scss_dir, workdir)
+
+            def compile(job):
+                source, target, *_ = job
+                result = self.compile(os.path.join(mirrors[os.path.dirname(source)], os.path.basename(source)), target)
+                # Errors point at the sources, not their copies
+                for scss_dir, mirror_dir in mirrors.items():
+                    result.stderr = result.stderr.replace(mirror_dir, scss_dir)
+                return result
+
+            with ThreadPoolExecutor(max_workers=self.jobs) as pool:
+                results = list(pool.map(compile, pending))
+
+        failed = 0
+        for (source, target, key, digest), result in zip(pending, results):
+            if result.returncode == 0:
+                manifest[key] = digest
+                self.stdout.write(f'Compiled {os.path.relpath(source, settings.BASE_DIR)}')
+            else:
+                failed += 1
+                # A failed stylesheet is rebuilt next time even if its inputs stay the same
+                manifest.pop(key, None)
+                error = result.stderr.strip() or f'exit status {result.returncode}'
+                self.stderr.write(f'Failed {os.path.relpath(source, settings.BASE_DIR)}:\n{error}')
+        self.save_manifest(manifest)
+
+        elapsed = time.perf_counter() - started
+        message = f'{len(pending) - failed} compiled, {failed} failed in {elapsed:.2f} s.'
+        self.stdout.write(self.style.ERROR(message) if failed else self.style.SUCCESS(message))
+        return not failed
@@ -0,0 +1,71 @@
+from collections import Counter, defaultdict
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from utils import profiling
+
+import io
+import os
+import pstats
+
+
+class Command(BaseCommand):
+    help = (
+        'Merges request profiles per URL name, pstats into one .prof file with a .txt summary '
+        'and collapsed stacks into one .folded file for flamegraph tools.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dir', default=str(settings.PROFILING_DIR), help='Directory with request profiles.')
+        parser.add_argument('--output', help='Directory for merged profiles, defaults to "merged" inside --dir.')
+        parser.add_argument('--view', help='Only merge profiles of this URL name.')
+        parser.add_argument('--top', type=int, default=30, help='Functions listed in summaries.')
+
+    def handle(self, *args, **options):
+        directory = options['dir']
+        if not os.path.isdir(directory):
+            raise CommandError(f'No profiles in {directory}.')
+        output = options['output'] or os.path.join(directory, 'merged')
+        os.makedirs(output, exist_ok=True)
+
+        # {(view, extension): paths}
+        profiles = defaultdict(list)
+        for name in sorted(os.listdir(directory)):
+            view, separator, rest = name.rpartition(profiling.VIEW_SEPARATOR)
+            extension = os.path.splitext(rest)[1]
+            if not separator or extension not in profiling.EXTENSIONS.values():
+                continue
+            if options['view'] and view != options['view'].replace(':', '.'):
+                continue
+            profiles[(view, extension)].append(os.path.join(directory, name))
+
+        if not profiles:
+            raise CommandError('No matching profiles.')
+
+        for (view, extension), paths in sorted(profiles.items()):
+            target = os.path.join(output, view + extension)
+            if extension == '.prof':
+                self.merge_pstats(paths, target, options['top'])
+            else:
+                self.merge_stacks(paths, target)
+            self.stdout.write(f'{view}: {len(paths)} profiles -> {target}')
+
+    def merge_pstats(self, paths: list[str], target: str, top: int) -> None:
+        summary = io.StringIO()
+        stats = pstats.Stats(*paths, stream=summary)
+        stats.dump_stats(target)
+        stats.sort_stats('cumulative').print_stats(top)
+
+        with open(os.path.splitext(target)[0] + '.txt', 'w') as file:
+            file.write(summary.getvalue())
+
+    def merge_stacks(self, paths: list[str], target: str) -> None:
+        stacks = Counter()
+        for path in paths:
+            with open(path) as file:
+                for line in file:
+                    stack, _, count = line.rstrip('\n').rpartition(' ')
+                    stacks[stack] += int(count)
+
+        with open(target, 'w') as file:
+            file.writelines(f'{stack} {count}\n' for stack, count in stacks.most_common())
@@ -0,0 +1,14 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from utils import profiling
+
+
+class Command(BaseCommand):
+    help = 'Prints a token profiling every request that carries it in the PROFILING_HEADER header.'
+
+    def handle(self, *args, **options):
+        self.stdout.write(profiling.make_token())
+        self.stderr.write(
+            f'Send it as "{settings.PROFILING_HEADER}", valid for {settings.PROFILING_TOKEN_MAX_AGE} s.'
+        )
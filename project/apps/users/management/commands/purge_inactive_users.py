@@ -0,0 +1,100 @@
+from datetime import timedelta
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Q, Value
+from django.utils import timezone
+
+import time
+
+
+class Command(BaseCommand):
+    help = (
+        'Deletes accounts that were never activated, oldest first, in small batches '
+        'walking the (is_active, date_joined) index. Safe to run while the site is live.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--older-than', type=float, default=settings.USERS_PURGE_INACTIVE_AFTER / 86400,
+            help='Days since sign-up after which an account that was never activated is deleted.',
+        )
+        parser.add_argument('--batch-size', type=int, default=500, help='Accounts deleted per transaction.')
+        parser.add_argument('--sleep', type=float, default=0.5, help='Seconds between batches, leaves room for other writers.')
+        parser.add_argument('--limit', type=int, help='Stop after deleting this many accounts.')
+        parser.add_argument('--dry-run', action='store_true', help='Only count the accounts that would be deleted.')
+
+    def handle(self, *args, **options):
+        older_than = timedelta(days=options['older_than'])
+        # Deleting accounts whose activation link still works would break the link
+        if older_than.total_seconds() < settings.PASSWORD_RESET_TIMEOUT:
+            raise CommandError(f'--older-than has to cover the activation link lifetime of {settings.PASSWORD_RESET_TIMEOUT} s.')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size has to be positive.')
+
+        cutoff = timezone.now() - older_than
+        if options['dry_run']:
+            count = self.candidates(cutoff).count()
+            self.stdout.write(f'{count} accounts that were never activated joined before {cutoff:%Y-%m-%d %H:%M}, nothing deleted.')
+            return
+
+        started = time.perf_counter()
+        users = related = batches = 0
+        for pks in self.batches(cutoff, options['batch_size'], options['limit']):
+            if batches:
+                time.sleep(options['sleep'])
+            with transaction.atomic():
+                # Rechecked while deleting, an account may have been activated since it was selected
+                _, deleted = self.candidates(cutoff).filter(pk__in=pks).delete()
+
+            batch_users = deleted.pop(get_user_model()._meta.label, 0)
+            users += batch_users
+            related += sum(deleted.values())
+            batches += 1
+            self.stdout.write(f'Batch {batches}: {batch_users} accounts, {sum(deleted.values())} related rows')
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Deleted {users} accounts and {related} related rows in {batches} batches, {elapsed:.1f} s.'
+        ))
+
+
+    def candidates(self, cutoff):
+        """Accounts never activated nor logged in, staff accounts are only ever deactivated on purpose."""
+
+        return get_user_model().objects.filter(
+            # A plain False becomes 'NOT is_active' on SQLite, which can't seek the index
+            is_active=Value(False),
+            date_joined__lt=cutoff,
+            last_login__isnull=True,
+            is_staff=False,
+            is_superuser=False,
+        )
+
+    def batches(self, cutoff, batch_size: int, limit: int = None):
+        """
+        Yields primary keys of candidates, oldest first.
+
+        Continues after the last (date_joined, pk) instead of starting over, so rows matching
+        the index but not the other conditions are only read once.
+        """
+
+        remaining = limit
+        after = Q()
+        while remaining is None or remaining > 0:
+            size = batch_size if remaining is None else min(batch_size, remaining)
+            rows = list(
+                self.candidates(cutoff)
+                .filter(after)
+                .order_by('date_joined', 'pk')
+                .values_list('date_joined', 'pk')[:size]
+            )
+            if not rows:
+                return
+
+            yield [pk for _, pk in rows]
+            if remaining is not None:
+                remaining -= len(rows)
+            last_joined, last_pk = rows[-1]
+            after = Q(date_joined__gt=last_joined) | Q(date_joined=last_joined, pk__gt=last_pk)
@@ -0,0 +1,131 @@
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Group
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from users import hashing
+from users.models import normalize_email
+
+import os
+import random
+import time
+
+
+class Command(BaseCommand):
+    help = 'Creates synthetic users for capacity testing, resuming where a previous run stopped.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('count', type=int, help='Total number of seeded users to end up with.')
+        parser.add_argument('--prefix', default='seed', help='Prefix of seeded usernames and emails.')
+        parser.add_argument('--password', default='seed-password', help='Password of every seeded user.')
+        parser.add_argument('--chunk-size', type=int, default=5000, help='Users inserted per transaction.')
+        parser.add_argument('--active-ratio', type=float, default=0.8, help='Share of activated users.')
+        parser.add_argument('--groups', default='', help='Comma separated groups users are randomly added to.')
+        parser.add_argument('--group-ratio', type=float, default=0.1, help='Chance of joining each group.')
+        parser.add_argument('--unique-hashes', action='store_true', help='Hash the password separately for every user.')
+        parser.add_argument('--workers', type=int, default=os.cpu_count(), help='Processes used with --unique-hashes.')
+        parser.add_argument('--seed', type=int, help='Random seed for a reproducible data set.')
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        prefix = options['prefix']
+        chunk_size = options['chunk_size']
+        if chunk_size < 1:
+            raise CommandError('--chunk-size has to be positive.')
+
+        rng = random.Random(options['seed'])
+        groups = [
+            Group.objects.get_or_create(name=name.strip())[0]
+            for name in options['groups'].split(',') if name.strip()
+        ]
+
+        start = self.next_index(prefix)
+        if start >= options['count']:
+            self.stdout.write(f'Already seeded {start} users.')
+            return
+        self.stdout.write(f'Seeding users {start} to {options["count"] - 1}.')
+
+        pool = None
+        if options['unique_hashes']:
+            pool = ProcessPoolExecutor(
+                max_workers=options['workers'],
+                initializer=hashing.init_worker,
+                initargs=(os.environ.get('DJANGO_SETTINGS_MODULE', ''),),
+            )
+        else:
+            # Hashing is by far the slowest part, one shared hash keeps seeding IO bound
+            password = make_password(options['password'])
+
+        started = time.perf_counter()
+        created = 0
+        now = timezone.now()
+        try:
+            for chunk_start in range(start, options['count'], chunk_size):
+                indexes = range(chunk_start, min(chunk_start + chunk_size, options['count']))
+                if pool:
+                    passwords = list(pool.map(make_password, [options['password']] * len(indexes), chunksize=64))
+                else:
+                    passwords = [password] * len(indexes)
+
+                users = [
+                    User(
+                        username=f'{prefix}{index:010d}',
+                        email=f'{prefix}{index:010d}@example.com',
+                        # bulk_create() doesn't go through save()
+                        normalized_email=normalize_email(f'{prefix}{index:010d}@example.com'),
+                        password=user_password,
+                        is_active=rng.random() < options['active_ratio'],
+                        date_joined=now - timedelta(seconds=rng.randrange(2 * 365 * 24 * 3600)),
+                    )
+                    for index, user_password in zip(indexes, passwords)
+                ]
+
+                with transaction.atomic():
+                    users = User.objects.bulk_create(users, batch_size=chunk_size)
+                    if groups:
+                        self.add_to_groups(users, groups, options['group_ratio'], rng)
+
+                created += len(users)
+                elapsed = time.perf_counter() - started
+                self.stdout.write(f'{chunk_start + len(users)} users, {created / elapsed:.0f} rows/s')
+        finally:
+            if pool:
+                pool.shutdown()
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f'Created {created} users in {elapsed:.1f} s, {created / elapsed:.0f} rows/s.'))
+
+    def next_index(self, prefix: str) -> int:
+        """Returns the index following the last seeded user, usernames are zero padded so they sort by index."""
+
+        # A range walks the username index backwards, a regex would scan every row after the prefix
+        usernames = (
+            get_user_model().objects
+            .filter(username__gte=prefix, username__lt=prefix + '\uffff')
+            .order_by('-username')
+            .values_list('username', flat=True)
+        )
+        for username in usernames.iterator(chunk_size=100):
+            suffix = username[len(prefix):]
+            if len(suffix) == 10 and suffix.isascii() and suffix.isdigit():
+                return int(suffix) + 1
+        return 0
+
+    def add_to_groups(self, users: list, groups: list[Group], ratio: float, rng: random.Random) -> None:
+        User = get_user_model()
+        if any(user.pk is None for user in users):
+            # Backends without RETURNING support don't set primary keys in bulk_create
+            pks = dict(User.objects.filter(username__in=[user.username for user in users]).values_list('username', 'pk'))
+            for user in users:
+                user.pk = pks[user.username]
+
+        User.groups.through.objects.bulk_create([
+            User.groups.through(user_id=user.pk, group_id=group.pk)
+            for user in users
+            for group in groups
+            if rng.random() < ratio
+        ])
@@ -0,0 +1,50 @@
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.cache import caches as cache_backends
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from utils import caches
+from utils.sessions import SessionStore
+
+
+class Command(BaseCommand):
+    help = 'Reports how many server-side sessions are cached and how many only sit in the database.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        # The cache the session engine reads, as configured by Django's cached session backends
+        cache = cache_backends[settings.SESSION_CACHE_ALIAS]
+        chunk_size = options['chunk_size']
+        # A process-local cache is skipped by the session engine, and would be this command's own anyway
+        shared = caches.is_shared(settings.SESSION_CACHE_ALIAS)
+
+        active = Session.objects.filter(expire_date__gt=timezone.now())
+        expired = Session.objects.filter(expire_date__lte=timezone.now()).count()
+
+        total = cached = 0
+        last_key = ''
+        while True:
+            keys = list(
+                active
+                .filter(session_key__gt=last_key)
+                .order_by('session_key')
+                .values_list('session_key', flat=True)[:chunk_size]
+            )
+            if not keys:
+                break
+
+            total += len(keys)
+            if shared:
+                cached += len(cache.get_many([SessionStore.cache_key_prefix + key for key in keys]))
+            last_key = keys[-1]
+
+        if shared:
+            self.stdout.write(f'cache:    {cached}')
+        else:
+            self.stdout.write('cache:    not used, the cache backend is local to each process')
+        self.stdout.write(f'database: {total - cached} (not cached)')
+        self.stdout.write(f'expired:  {expired} (run clearsessions to remove)')
+        self.stdout.write('cookie:   not countable, signed cookie sessions are only stored by clients')
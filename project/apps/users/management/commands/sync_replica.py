@@ -0,0 +1,40 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+import sqlite3
+import time
+
+
+class Command(BaseCommand):
+    help = 'Copies the SQLite primary database into every SQLite replica in DATABASE_REPLICAS.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, help='Keep copying every INTERVAL seconds.')
+
+    def handle(self, *args, **options):
+        primary = connections.settings['default']
+        replicas = [connections.settings[alias] for alias in settings.DATABASE_REPLICAS]
+        if not replicas:
+            raise CommandError('No replicas configured, see DATABASE_REPLICAS.')
+
+        for database in [primary, *replicas]:
+            if 'sqlite3' not in database['ENGINE'] and database['ENGINE'] != 'utils.sqlite':
+                raise CommandError(f"Only SQLite databases can be copied, got '{database['ENGINE']}'.")
+
+        while True:
+            started = time.perf_counter()
+            for replica in replicas:
+                self.copy(primary['NAME'], replica['NAME'])
+            self.stdout.write(f'Copied to {len(replicas)} replicas in {(time.perf_counter() - started) * 1000:.1f} ms.')
+
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
+
+    def copy(self, source: str, target: str) -> None:
+        # The backup API takes a consistent snapshot, even while the primary is being written to
+        with sqlite3.connect(source) as src, sqlite3.connect(target) as dst:
+            src.backup(dst)
+        src.close()
+        dst.close()
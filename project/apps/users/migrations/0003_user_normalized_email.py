@@ -0,0 +1,44 @@
+import users.models
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import Lower, Trim
+
+
+def check_duplicate_emails(apps, schema_editor):
+    """Fails before changing the schema, so the migration can be re-run once duplicates are merged."""
+
+    User = apps.get_model('users', 'User')
+    duplicates = list(
+        User.objects.using(schema_editor.connection.alias)
+        .values_list(Lower(Trim('email')), flat=True)
+        .annotate(count=Count('pk'))
+        .filter(count__gt=1)[:10]
+    )
+    if duplicates:
+        raise RuntimeError(
+            'Emails differing only in case have to be merged before they can be unique: '
+            + ', '.join(duplicates)
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_loginevent'),
+    ]
+
+    operations = [
+        migrations.RunPython(check_duplicate_emails, migrations.RunPython.noop),
+        migrations.AlterModelManagers(
+            name='user',
+            managers=[
+                ('objects', users.models.UserManager()),
+            ],
+        ),
+        # Filled by 0005_backfill_normalized_email, then made unique by 0006_unique_normalized_email
+        migrations.AddField(
+            model_name='user',
+            name='normalized_email',
+            field=models.CharField(editable=False, max_length=254, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.6 on 2026-10-18 19:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('users', '0003_user_normalized_email'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['is_active', 'date_joined'], name='users_user_active_joined_idx'),
+        ),
+    ]
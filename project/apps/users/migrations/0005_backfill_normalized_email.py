@@ -0,0 +1,39 @@
+from django.db import migrations, transaction
+
+
+# Rows normalized per transaction, so large tables aren't locked for the whole backfill
+BATCH_SIZE = 1000
+
+
+def backfill_normalized_email(apps, schema_editor):
+    User = apps.get_model('users', 'User')
+    manager = User.objects.using(schema_editor.connection.alias)
+
+    # Only rows still missing it, so an interrupted backfill continues where it stopped
+    last_pk = 0
+    while True:
+        with transaction.atomic(using=schema_editor.connection.alias):
+            users = list(
+                manager.filter(normalized_email__isnull=True, pk__gt=last_pk)
+                .order_by('pk').only('pk', 'email')[:BATCH_SIZE]
+            )
+            if not users:
+                break
+            for user in users:
+                user.normalized_email = user.email.strip().lower()
+            manager.bulk_update(users, ['normalized_email'])
+        last_pk = users[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    # Every batch of the backfill commits on its own
+    atomic = False
+
+    dependencies = [
+        ('users', '0004_user_active_joined_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_normalized_email, migrations.RunPython.noop),
+    ]
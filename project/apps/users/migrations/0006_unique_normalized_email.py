@@ -0,0 +1,35 @@
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def check_duplicate_emails(apps, schema_editor):
+    """Catches duplicates signed up between 0003_user_normalized_email and the backfill."""
+
+    User = apps.get_model('users', 'User')
+    duplicates = list(
+        User.objects.using(schema_editor.connection.alias)
+        .values_list('normalized_email', flat=True)
+        .annotate(count=Count('pk'))
+        .filter(count__gt=1)[:10]
+    )
+    if duplicates:
+        raise RuntimeError(
+            'Emails differing only in case have to be merged before they can be unique: '
+            + ', '.join(duplicates)
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0005_backfill_normalized_email'),
+    ]
+
+    operations = [
+        migrations.RunPython(check_duplicate_emails, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='user',
+            name='normalized_email',
+            field=models.CharField(editable=False, error_messages={'unique': 'A user with that email already exists.'}, max_length=254, unique=True),
+        ),
+    ]
@@ -1,12 +1,95 @@
+from django.conf import settings
 from django.db import models
-from django.contrib.auth.models import AbstractUser
+from django.contrib.auth.models import AbstractUser, UserManager as DjangoUserManager
+from . import hashing
+
+
+def normalize_email(email: str) -> str:
+    """Returns the form of `email` compared by lookups, addresses differing only in case are the same."""
+
+    return email.strip().lower()
+
+
+class UserManager(DjangoUserManager):
+    def by_email(self, email: str | None) -> models.QuerySet:
+        """Users with `email`, ignoring case, looked up through the unique index of `normalized_email`."""
+
+        if email is None:
+            return self.none()
+        return self.filter(normalized_email=normalize_email(email))
+
+    def get_by_natural_key(self, username):
+        return self.by_email(username).get()
+
+    async def aget_by_natural_key(self, username):
+        return await self.by_email(username).aget()
 
 
 class User(AbstractUser):
     email = models.EmailField(unique=True)
+    # Kept in sync by save(), set it as well when bypassing it, e.g. in bulk_create()
+    normalized_email = models.CharField(
+        max_length=254, unique=True, editable=False,
+        error_messages={'unique': 'A user with that email already exists.'},
+    )
+
+    objects = UserManager()
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username']
 
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            # Never activated accounts by age, for 'manage.py purge_inactive_users'
+            models.Index(fields=['is_active', 'date_joined'], name='users_user_active_joined_idx'),
+        ]
+
+    def __str__(self) -> str:
+        return self.username
+
+    def save(self, *args, **kwargs):
+        self.normalized_email = normalize_email(self.email)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'email' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'normalized_email'}
+        super().save(*args, **kwargs)
+
+    # Hashing goes through 'users.hashing', which may run it in a process pool
+    def set_password(self, raw_password):
+        self.password = hashing.make_password(raw_password)
+        self._password = raw_password
+
+    def check_password(self, raw_password):
+        def setter(raw_password):
+            self.set_password(raw_password)
+            # Password hash upgrades shouldn't be considered password changes.
+            self._password = None
+            self.save(update_fields=['password'])
+
+        return hashing.check_password(raw_password, self.password, setter)
+
+    async def acheck_password(self, raw_password):
+        async def setter(raw_password):
+            self.password = await hashing.amake_password(raw_password)
+            self._password = None
+            await self.asave(update_fields=['password'])
+
+        return await hashing.acheck_password(raw_password, self.password, setter)
+
+
+
+class LoginEvent(models.Model):
+    """A successful login, written in bulk by 'users.logins'."""
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='logins')
+    logged_in_at = models.DateTimeField()
+    ip_address = models.GenericIPAddressField(null=True, blank=True)
+    user_agent = models.CharField(max_length=255, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-logged_in_at']),
+        ]
+
     def __str__(self) -> str:
-        return self.username
\ No newline at end of file
+        return f'{self.user_id} at {self.logged_in_at:%Y-%m-%d %H:%M:%S}'
@@ -0,0 +1,53 @@
+from django.contrib.auth.models import Group
+from django.contrib.auth.signals import user_logged_out
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from utils import roles, usercache
+from .models import User
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+def invalidate_roles_on_membership_change(sender, instance, action, reverse, pk_set, **kwargs):
+    # 'group.user_set.clear()' doesn't provide the affected users afterwards
+    if action == 'pre_clear' and reverse:
+        instance._cleared_user_pks = list(instance.user_set.values_list('pk', flat=True))
+        return
+
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+
+    if not reverse:
+        roles.invalidate(instance.pk)
+    elif action == 'post_clear':
+        roles.invalidate(*getattr(instance, '_cleared_user_pks', []))
+    else:
+        roles.invalidate(*pk_set)
+
+
+@receiver(post_save, sender=Group)
+def invalidate_roles_on_group_save(sender, instance, created, **kwargs):
+    if not created:
+        roles.invalidate(*instance.user_set.values_list('pk', flat=True))
+
+
+@receiver(pre_delete, sender=Group)
+def invalidate_roles_on_group_delete(sender, instance, **kwargs):
+    roles.invalidate(*instance.user_set.values_list('pk', flat=True))
+
+
+# Cached users, password changes are saves as well
+@receiver(post_save, sender=User)
+def invalidate_user_on_save(sender, instance, **kwargs):
+    usercache.invalidate(instance.pk)
+
+
+@receiver(post_delete, sender=User)
+def invalidate_user_on_delete(sender, instance, **kwargs):
+    usercache.invalidate(instance.pk)
+
+
+@receiver(user_logged_out)
+def invalidate_user_on_logout(sender, request, user, **kwargs):
+    if user is not None:
+        usercache.invalidate(user.pk)
@@ -1,3 +1,855 @@
-from django.test import TestCase
+from datetime import timedelta
+from django.conf import settings
+from django.contrib.auth import authenticate, get_user_model
+from django.contrib.auth import hashers
+from django.contrib.auth.models import Group
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.cache.backends.filebased import FileBasedCache
+from django.http import HttpResponse
+from django.core.management import CommandError, call_command
+from django.db import DatabaseError, connection, transaction
+from django.template import Context, Template
+from django.test import Client, RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils.encoding import force_bytes
+from django.utils import timezone
+from django.utils.http import urlsafe_base64_encode
+from pathlib import Path
+from mailing.models import OutboxMessage
+from unittest import mock
+from utils import assets, budgets, logs, metrics, pagecache, profiling, replicas, roles, sessions, usercache, warmup
+from utils.views import add_preload_header
 
-# Create your tests here.
+from . import urls
+from . import activation, hashing
+from .backends import EmailBackend
+from .logins import LoginBuffer
+from .forms import RegisterForm
+from .models import LoginEvent
+from .tokens import account_activation_token
+
+import asyncio
+import io
+import json
+import logging
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+
+# Stands in for the sass compiler: writes the input followed by the partials next to it
+FAKE_SASS = """
+import glob, os, sys
+source, target = sys.argv[-2:]
+with open(source) as file:
+    css = file.read()
+if 'error' in css:
+    sys.exit(f'Error in {source}')
+for partial in sorted(glob.glob(os.path.join(os.path.dirname(source), '_*.scss'))):
+    with open(partial) as file:
+        css += file.read()
+with open(target, 'w') as file:
+    file.write(css)
+"""
+
+
+class BuildAssetsTests(SimpleTestCase):
+    def setUp(self):
+        self.base_dir = Path(self.enterContext(tempfile.TemporaryDirectory()))
+        self.enterContext(self.settings(BASE_DIR=self.base_dir))
+
+        self.sass = self.base_dir / 'sass.py'
+        self.sass.write_text(f'#!{sys.executable}\n{FAKE_SASS}')
+        self.sass.chmod(0o755)
+
+        self.write('sass/sass.scss', '$gap: 1rem;')
+        self.write('static/app/scss/page.scss', '.page { margin: $gap; }')
+        self.write('static/app/scss/_part.scss', '.part { margin: $gap; }')
+
+    def write(self, name: str, content: str) -> None:
+        path = self.base_dir / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content)
+
+    def build(self, **options) -> str:
+        out = io.StringIO()
+        call_command('buildassets', sass=str(self.sass), stdout=out, stderr=out, **options)
+        return out.getvalue()
+
+    def test_only_changed_stylesheets_are_rebuilt(self):
+        self.assertIn('1 compiled', self.build())
+        css = (self.base_dir / 'static/app/styles/page.css').read_text()
+        # The preamble reaches stylesheets and partials, sources stay untouched
+        self.assertEqual(css.count('@use "sass" as *;'), 2)
+        self.assertEqual((self.base_dir / 'static/app/scss/page.scss').read_text(), '.page { margin: $gap; }')
+        self.assertIn('static/app/styles/page.css', json.loads((self.base_dir / 'static/.assets-manifest.json').read_text()))
+
+        self.assertIn('up to date', self.build())
+        self.write('static/app/scss/_part.scss', '.part { padding: $gap; }')
+        self.assertIn('1 compiled', self.build())
+        self.write('sass/sass.scss', '$gap: 2rem;')
+        self.assertIn('1 compiled', self.build())
+        self.assertIn('1 compiled', self.build(force=True))
+
+    def test_failures_exit_with_an_error(self):
+        self.write('static/app/scss/page.scss', 'error')
+
+        with self.assertRaises(CommandError) as raised:
+            self.build()
+        self.assertEqual(raised.exception.returncode, 1)
+        self.assertEqual(json.loads((self.base_dir / 'static/.assets-manifest.json').read_text()), {})
+
+        self.write('static/app/scss/page.scss', '.page {}')
+        self.assertIn('1 compiled', self.build())
+
+
+class SQLiteProductionProfileTests(SimpleTestCase):
+    def test_concurrent_writers_never_hit_lock_errors(self):
+        # Runs in its own process, the stress test registers its own database
+        result = subprocess.run(
+            [sys.executable, '-m', 'benchmarks.sqlite_writers', '--threads', '16', '--writes', '50'],
+            cwd=settings.BASE_DIR, capture_output=True, text=True,
+        )
+        self.assertEqual(result.returncode, 0, result.stdout + result.stderr)
+        self.assertIn('0 lock errors', result.stdout)
+
+
+class WarmupTests(SimpleTestCase):
+    def tearDown(self):
+        warmup.READY.clear()
+
+    def test_failed_step_keeps_the_worker_out_of_rotation(self):
+        with self.assertLogs('utils.warmup', 'ERROR'):
+            warmup.run(['utils.warmup.warm_urls', 'utils.warmup.missing_step'])
+        self.assertFalse(warmup.READY.is_set())
+        with self.assertLogs('django.request', 'ERROR'):
+            self.assertEqual(self.client.get('/health/ready').status_code, 503)
+
+        with self.assertLogs('utils.warmup', 'INFO'):
+            warmup.run(['utils.warmup.warm_urls'])
+        self.assertEqual(self.client.get('/health/ready').status_code, 200)
+
+
+@override_settings(DATABASE_REPLICAS=['replica-1', 'replica-2', 'replica-3'])
+class ReplicaRouterTests(SimpleTestCase):
+    def setUp(self):
+        self.router = replicas.ReplicaRouter()
+        self.User = get_user_model()
+
+    def serve(self, request, view=None) -> tuple[HttpResponse, list[str]]:
+        """Runs `view` behind the pinning middleware, returns the response and where reads went."""
+
+        reads = []
+
+        def get_response(request):
+            if view:
+                view()
+            reads.extend(self.router.db_for_read(self.User) for _ in range(10))
+            return HttpResponse()
+
+        return replicas.ReplicaPinningMiddleware(get_response)(request), reads
+
+    def pinned_request(self, pin: str):
+        factory = RequestFactory()
+        factory.cookies[replicas.PIN_COOKIE] = pin
+        return factory.get('/')
+
+    def test_reads_of_a_request_stay_on_one_replica(self):
+        _, reads = self.serve(RequestFactory().get('/'))
+        self.assertEqual(len(set(reads)), 1)
+        self.assertIn(reads[0], settings.DATABASE_REPLICAS)
+        self.assertIsNone(self.router.db_for_read(Group))
+
+    def test_unsafe_requests_and_primary_blocks_read_from_the_primary(self):
+        _, reads = self.serve(RequestFactory().post('/'))
+        self.assertEqual(set(reads), {'default'})
+
+        with replicas.primary():
+            self.assertEqual(self.router.db_for_read(self.User), 'default')
+
+    def test_writes_pin_the_client_to_the_primary(self):
+        response, reads = self.serve(RequestFactory().get('/'), lambda: self.router.db_for_write(self.User))
+        self.assertEqual(set(reads), {'default'})
+        pin = response.cookies[replicas.PIN_COOKIE].value
+
+        _, reads = self.serve(self.pinned_request(pin))
+        self.assertEqual(set(reads), {'default'})
+
+        # Expired pins and garbage are ignored
+        for pin in ('1', 'garbage'):
+            _, reads = self.serve(self.pinned_request(pin))
+            self.assertIn(reads[0], settings.DATABASE_REPLICAS)
+
+
+class MetricsTests(SimpleTestCase):
+    def test_metrics_are_only_served_to_allowed_clients(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 200)
+        with self.assertLogs('django.request', 'WARNING'):
+            self.assertEqual(self.client.get('/metrics', REMOTE_ADDR='203.0.113.7').status_code, 404)
+
+        with self.settings(METRICS_TOKEN='scraper-token'), self.assertLogs('django.request', 'WARNING') as logs:
+            for token, status in (('scraper-token', 200), ('wrong-token', 404)):
+                response = self.client.get('/metrics', REMOTE_ADDR='203.0.113.7', headers={'Authorization': f'Bearer {token}'})
+                self.assertEqual(response.status_code, status)
+        self.assertEqual(len(logs.records), 1)
+
+    def test_hashing_queue_is_exported(self):
+        with mock.patch.object(hashing, 'get_executor', return_value=hashing.HashingExecutor(workers=1, max_pending=4)):
+            rendered = metrics.render()
+        self.assertIn('# TYPE password_hashing_pending gauge\npassword_hashing_pending 0\n', rendered)
+        self.assertIn('password_hashing_max_pending 4\n', rendered)
+        self.assertIn('# TYPE password_hashing_completed_total counter\n', rendered)
+
+        with mock.patch.object(hashing, 'get_executor', return_value=None):
+            self.assertNotIn('password_hashing', metrics.render())
+
+    def test_shards_of_finished_threads_are_merged(self):
+        registry = metrics.Registry()
+        for _ in range(5):
+            thread = threading.Thread(target=registry.observe, args=('metric', 'view', 0.1))
+            thread.start()
+            thread.join()
+        registry.observe('metric', 'view', 0.2)
+
+        self.assertEqual(len(registry._shards), 1)
+        histogram = registry.collect()[('metric', 'view')]
+        self.assertEqual(sum(histogram.counts), 6)
+        self.assertAlmostEqual(histogram.sum, 0.7)
+
+
+class HashingExecutorTests(SimpleTestCase):
+    def test_cancelled_waits_give_their_slot_back(self):
+        executor = hashing.HashingExecutor(workers=1, max_pending=1)
+        # Stands in for a running job, the pool is saturated
+        executor._slots.acquire()
+
+        async def cancel_waiting() -> bool:
+            waiting = asyncio.create_task(executor.arun(hashers.make_password, 'password'))
+            await asyncio.sleep(0.05)
+            waiting.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await waiting
+
+            # The job finishes, the cancelled wait takes its slot and hands it back
+            executor._slots.release()
+            await asyncio.sleep(0.1)
+            return await asyncio.to_thread(executor._slots.acquire, timeout=1)
+
+        self.assertTrue(asyncio.run(cancel_waiting()))
+
+
+class ProfilingTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = self.enterContext(tempfile.TemporaryDirectory())
+
+    def serve(self, mode: str = 'cprofile') -> HttpResponse:
+        with self.settings(PROFILING_MODE=mode, PROFILING_DIR=self.directory):
+            middleware = profiling.ProfilingMiddleware(lambda request: HttpResponse())
+            return middleware(RequestFactory(headers={settings.PROFILING_HEADER: profiling.make_token()}).get('/'))
+
+    def test_requested_profiles_are_written(self):
+        self.serve('cprofile')
+        self.serve('sample')
+        self.assertEqual(sorted(os.path.splitext(name)[1] for name in os.listdir(self.directory)), ['.folded', '.prof'])
+
+    def test_only_one_request_per_process_is_cprofiled(self):
+        # As if another thread was profiling a request
+        with profiling.cprofile_lock:
+            self.serve()
+        self.assertEqual(os.listdir(self.directory), [])
+
+        self.serve()
+        self.assertEqual(len(os.listdir(self.directory)), 1)
+
+    def test_unwritable_profiles_are_logged(self):
+        self.directory = os.path.join(self.directory, 'file')
+        open(self.directory, 'w').close()
+
+        with self.assertLogs('utils.profiling', 'ERROR'):
+            self.assertEqual(self.serve().status_code, 200)
+        self.assertFalse(profiling.cprofile_lock.locked())
+
+    def test_stopped_samples_are_not_written_to(self):
+        sampler = profiling.Sampler()
+        with self.settings(PROFILING_SAMPLE_INTERVAL=0.001):
+            sampler.start(threading.get_ident())
+            time.sleep(0.02)
+            stacks = sampler.stop(threading.get_ident())
+            samples = stacks.total()
+            time.sleep(0.02)
+
+        self.assertGreater(samples, 0)
+        self.assertEqual(stacks.total(), samples)
+
+
+class RequestIDTests(SimpleTestCase):
+    def test_error_responses_are_logged_with_the_request_id(self):
+        with self.assertLogs('django.request', 'WARNING') as captured:
+            response = self.client.get('/missing-page', headers={logs.REQUEST_ID_HEADER: 'lost-404'})
+        self.assertEqual(response[logs.REQUEST_ID_HEADER], 'lost-404')
+
+        # Logged after the middleware returned, the filter still finds the ID
+        record = captured.records[0]
+        logs.RequestIDFilter().filter(record)
+        self.assertEqual(record.request_id, 'lost-404')
+
+    def test_records_dropped_by_full_queues_are_reported(self):
+        handler = logs.QueueHandler([logging.NullHandler()], maxsize=1)
+        # Pretends the listener is running, so nothing drains the queue
+        handler._pid = os.getpid()
+        dropped = logs.dropped()
+
+        for message in ('kept', 'dropped', 'dropped'):
+            handler.emit(logging.makeLogRecord({'msg': message}))
+        self.assertEqual(handler.dropped, 2)
+        self.assertIn(f'log_records_dropped_total {dropped + 2}\n', metrics.render())
+
+
+PRELOAD_TEMPLATES = {
+    'parent.html': (
+        "{% load assets %}{% stylesheet 'base.css' %}"
+        "{% block styles %}{% stylesheet 'parent.css' %}{% endblock %}"
+        "{% block content %}{% stylesheet 'content.css' %}{% endblock %}"
+    ),
+    'child.html': (
+        "{% extends 'parent.html' %}{% load assets %}"
+        "{% block styles %}{% stylesheet 'child.css' %}{% endblock %}"
+        "{% block content %}{{ block.super }}{% include 'widget.html' %}{% endblock %}"
+    ),
+    'widget.html': "{% load assets %}{% if show %}{% stylesheet 'widget.css' %}{% endif %}",
+}
+
+
+class PreloadTests(SimpleTestCase):
+    def setUp(self):
+        directory = self.enterContext(tempfile.TemporaryDirectory())
+        for name in ('base', 'parent', 'child', 'content', 'widget'):
+            Path(directory, f'{name}.css').write_text('body { margin: 0; }')
+
+        self.enterContext(self.settings(
+            STATICFILES_DIRS=[directory],
+            STORAGES={**settings.STORAGES, 'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'}},
+            ASSETS_INLINE_MAX_BYTES=0,
+            TEMPLATES=[{
+                'BACKEND': 'django.template.backends.django.DjangoTemplates',
+                'OPTIONS': {
+                    'loaders': [('django.template.loaders.locmem.Loader', PRELOAD_TEMPLATES)],
+                    'libraries': {'assets': 'utils.assets'},
+                },
+            }],
+        ))
+        assets.preloads.cache_clear()
+        self.addCleanup(assets.preloads.cache_clear)
+
+    def test_overridden_parent_blocks_are_not_preloaded(self):
+        self.assertEqual(
+            assets.preloads('child.html'),
+            ('/static/base.css', '/static/child.css', '/static/content.css', '/static/widget.css'),
+        )
+
+    def test_only_responses_get_a_header(self):
+        self.assertEqual(add_preload_header('rendered', 'child.html'), 'rendered')
+        self.assertIn('/static/child.css', add_preload_header(HttpResponse(), 'child.html')['Link'])
+
+
+def shared_cache(test: TestCase) -> str:
+    """Switches `test` to a file based cache, which all processes share unlike the default one."""
+
+    directory = test.enterContext(tempfile.TemporaryDirectory())
+    test.enterContext(test.settings(CACHES={
+        'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': directory},
+    }))
+    return directory
+
+
+class RolesCacheTests(TestCase):
+    def setUp(self):
+        shared_cache(self)
+        self.user = get_user_model().objects.create_user('member', 'member@example.com')
+        self.group = Group.objects.create(name='editors')
+
+    def get_roles(self) -> frozenset[str]:
+        request = RequestFactory().get('/')
+        request.user = self.user
+        return roles.get_roles(request)
+
+    def assertRolesAfter(self, change, expected: set[str]) -> None:
+        self.get_roles()
+        change()
+        self.assertEqual(self.get_roles(), expected)
+
+    def test_cached_roles_cost_no_query(self):
+        self.get_roles()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get_roles(), set())
+        self.assertIn('cache_hits_total{cache="roles"}', metrics.render())
+
+    def test_membership_changes_drop_cached_roles(self):
+        self.assertRolesAfter(lambda: self.user.groups.add(self.group), {'editors'})
+        self.assertRolesAfter(lambda: self.user.groups.remove(self.group), set())
+        self.assertRolesAfter(lambda: self.group.user_set.add(self.user), {'editors'})
+        self.assertRolesAfter(lambda: self.user.groups.clear(), set())
+        self.assertRolesAfter(lambda: self.group.user_set.add(self.user), {'editors'})
+        self.assertRolesAfter(lambda: self.group.user_set.clear(), set())
+
+    def test_group_changes_drop_cached_roles(self):
+        self.user.groups.add(self.group)
+
+        def rename():
+            self.group.name = 'reviewers'
+            self.group.save()
+
+        self.assertRolesAfter(rename, {'reviewers'})
+        self.assertRolesAfter(self.group.delete, set())
+
+    def test_process_local_cache_is_not_used(self):
+        with self.settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}):
+            self.get_roles()
+            with self.assertNumQueries(1):
+                self.get_roles()
+
+
+# Every route of 'users' with the requests exercising it, as
+# (url name, url kwargs, method, data, logged in, preceding request)
+BUDGET_SCENARIOS = [
+    ('login', {}, 'get', None, False, None),
+    ('login', {}, 'post', {'email': 'budget@example.com', 'password': 'budget-password'}, False, None),
+    ('logout', {}, 'get', None, True, None),
+    ('register', {}, 'get', None, False, None),
+    ('register', {}, 'post', {
+        'username': 'newcomer', 'email': 'newcomer@example.com',
+        'password1': 'Budget-pass-1', 'password2': 'Budget-pass-1',
+    }, False, None),
+    ('activation_activate', 'activation', 'get', None, False, None),
+    ('activation_success', {}, 'get', None, False, 'register'),
+    ('activation_fail', {}, 'get', None, False, 'register'),
+    ('change_password', {}, 'get', None, True, None),
+    ('change_password', {}, 'post', {'new_password1': 'Budget-pass-1', 'new_password2': 'Budget-pass-1'}, True, None),
+    ('reset_password', {}, 'get', None, False, None),
+    ('reset_password', {}, 'post', {'email': 'budget@example.com'}, False, None),
+    ('reset_password_reset', 'reset', 'get', None, False, None),
+    ('reset_password_reset', 'reset', 'post', {'new_password1': 'Budget-pass-1', 'new_password2': 'Budget-pass-1'}, False, None),
+    ('reset_password_success', {}, 'get', None, False, 'reset_password'),
+    ('reset_password_fail', {}, 'get', None, False, 'reset_password'),
+]
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class ViewBudgetTests(TestCase):
+    """Checks every route in 'users.urls' against `BUDGETS_FILE`."""
+
+    BUDGETS_FILE = Path(__file__).resolve().parent / 'budgets.json'
+
+    def setUp(self):
+        self.budgets = budgets.load(self.BUDGETS_FILE)
+        self.user = get_user_model().objects.create_user('budget', 'budget@example.com', 'budget-password')
+        self.inactive = get_user_model().objects.create_user('inactive', 'inactive@example.com', is_active=False)
+
+    def url_kwargs(self, kwargs) -> dict:
+        user = self.inactive if kwargs == 'activation' else self.user
+        if isinstance(kwargs, str):
+            return {
+                'uidb64': urlsafe_base64_encode(force_bytes(user.pk)),
+                'token': account_activation_token.make_token(user),
+            }
+        return kwargs
+
+    def test_every_route_has_a_budget_and_a_scenario(self):
+        names = {f'{urls.app_name}:{pattern.name}' for pattern in urls.PATHS}
+        self.assertEqual(names - set(self.budgets), set(), 'Routes without a budget')
+        self.assertEqual(names - {f'{urls.app_name}:{name}' for name, *_ in BUDGET_SCENARIOS}, set(), 'Routes without a scenario')
+
+    def test_views_stay_within_budget(self):
+        preceding_data = {
+            'register': {
+                'username': 'earlier', 'email': 'earlier@example.com',
+                'password1': 'Budget-pass-1', 'password2': 'Budget-pass-1',
+            },
+            'reset_password': {'email': 'budget@example.com'},
+        }
+
+        for name, kwargs, method, data, logged_in, preceding in BUDGET_SCENARIOS:
+            url_name = f'{urls.app_name}:{name}'
+            with self.subTest(url_name, method=method), transaction.atomic():
+                client = Client()
+                if logged_in:
+                    client.force_login(self.user)
+                if preceding:
+                    client.post(reverse(f'{urls.app_name}:{preceding}'), preceding_data[preceding])
+
+                url = reverse(url_name, kwargs=self.url_kwargs(kwargs))
+                with budgets.record() as usage:
+                    getattr(client, method)(url, data)
+
+                errors = budgets.check(usage, self.budgets[url_name])
+                self.assertFalse(errors, f'{method.upper()} {url} is over budget:\n' + '\n'.join(errors))
+                transaction.set_rollback(True)
+
+    def test_other_threads_are_not_recorded(self):
+        with budgets.record() as usage:
+            Template('own').render(Context())
+            thread = threading.Thread(target=Template('other').render, args=(Context(),))
+            thread.start()
+            thread.join()
+        self.assertEqual(len(usage.templates), 1)
+
+
+class AnonymousPageCacheTests(TestCase):
+    TOKEN_PATTERN = re.compile(r'name="csrfmiddlewaretoken" value="([^"]+)"')
+
+    def setUp(self):
+        pagecache.version.cache_clear()
+        self.addCleanup(pagecache.version.cache_clear)
+        self.url = reverse('users:login')
+
+    def token(self, response) -> str:
+        return self.TOKEN_PATTERN.search(response.content.decode())[1]
+
+    def test_cached_page_gets_a_fresh_csrf_token(self):
+        with self.settings(PAGE_CACHE_VERSION='test-fresh-token'):
+            Client().get(self.url)
+            hits = pagecache.stats.hits
+
+            client = Client(enforce_csrf_checks=True)
+            response = client.get(self.url)
+            self.assertEqual(pagecache.stats.hits, hits + 1)
+            self.assertNotIn(pagecache.CSRF_PLACEHOLDER, response.content)
+            self.assertIn('Cookie', response['Vary'])
+
+            # The substituted token passes the CSRF check
+            response = client.post(self.url, {'csrfmiddlewaretoken': self.token(response)})
+            self.assertEqual(response.status_code, 200)
+
+    def test_logged_in_users_bypass_the_cache(self):
+        user = get_user_model().objects.create_user('cached', 'cached@example.com', 'cached-password')
+        client = Client()
+        client.force_login(user)
+
+        with self.settings(PAGE_CACHE_VERSION='test-logged-in'):
+            Client().get(self.url)
+            hits = pagecache.stats.hits
+            response = client.get(self.url)
+
+        self.assertEqual(pagecache.stats.hits, hits)
+        self.assertContains(response, 'cached@example.com')
+
+    def test_new_release_renders_again(self):
+        with self.settings(PAGE_CACHE_VERSION='test-release-1'):
+            Client().get(self.url)
+        pagecache.version.cache_clear()
+
+        with self.settings(PAGE_CACHE_VERSION='test-release-2'):
+            misses = pagecache.stats.misses
+            Client().get(self.url)
+        self.assertEqual(pagecache.stats.misses, misses + 1)
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class SessionTierTests(TestCase):
+    def setUp(self):
+        get_user_model().objects.create_user('tiers', 'tiers@example.com', 'tiers-password')
+
+    def session_key(self, client: Client) -> str:
+        return client.cookies[settings.SESSION_COOKIE_NAME].value
+
+    def login(self, client: Client) -> str:
+        client.post(reverse('users:login'), {'email': 'tiers@example.com', 'password': 'tiers-password'})
+        return self.session_key(client)
+
+    def test_anonymous_flow_state_stays_in_the_cookie(self):
+        self.client.post(reverse('users:reset_password'), {'email': 'tiers@example.com'})
+
+        self.assertTrue(self.session_key(self.client).startswith(sessions.COOKIE_PREFIX))
+        self.assertFalse(Session.objects.exists())
+
+    def test_login_promotes_to_the_database(self):
+        self.client.post(reverse('users:reset_password'), {'email': 'tiers@example.com'})
+        session_key = self.login(self.client)
+
+        self.assertFalse(session_key.startswith(sessions.COOKIE_PREFIX))
+        self.assertTrue(Session.objects.filter(session_key=session_key).exists())
+        # The default cache is local to this process, other workers would never see it change
+        self.assertIsNone(cache.get(sessions.CachedDBStore.cache_key_prefix + session_key))
+
+        out = io.StringIO()
+        call_command('session_tiers', stdout=out)
+        self.assertIn('cache:    not used', out.getvalue())
+        self.assertIn('database: 1', out.getvalue())
+
+    def test_logout_ends_the_session_for_every_client(self):
+        shared_cache(self)
+        session_key = self.login(self.client)
+        self.assertIsNotNone(cache.get(sessions.CachedDBStore.cache_key_prefix + session_key))
+
+        replayed = Client()
+        replayed.cookies[settings.SESSION_COOKIE_NAME] = session_key
+        url = reverse('users:change_password')
+        self.assertEqual(replayed.get(url).status_code, 200)
+
+        self.client.get(reverse('users:logout'))
+        self.assertFalse(Session.objects.filter(session_key=session_key).exists())
+        self.assertIsNone(cache.get(sessions.CachedDBStore.cache_key_prefix + session_key))
+        self.assertRedirects(replayed.get(url), f'{settings.LOGIN_URL}?next={url}')
+
+
+@override_settings(USER_CACHE_ENABLED=True)
+class UserCacheTests(TestCase):
+    def setUp(self):
+        self.cache_dir = shared_cache(self)
+        self.user = get_user_model().objects.create_user('snapshot', 'snapshot@example.com', 'snapshot-password')
+        self.client.force_login(self.user)
+        self.url = reverse('users:change_password')
+
+    def test_cached_user_costs_no_query(self):
+        EmailBackend().get_user(self.user.pk)
+        with self.assertNumQueries(0):
+            user = EmailBackend().get_user(self.user.pk)
+
+        self.assertEqual(user.email, 'snapshot@example.com')
+        self.assertEqual(user.get_session_auth_hash(), self.user.get_session_auth_hash())
+
+    def test_other_processes_see_invalidations(self):
+        # A cache of its own, as another worker process would have
+        other = FileBasedCache(self.cache_dir, {})
+        usercache.get_user(self.user.pk)
+        self.assertIsNotNone(other.get(usercache.cache_key(self.user.pk)))
+
+        self.user.set_password('changed-password')
+        self.user.save()
+        self.assertIsNone(other.get(usercache.cache_key(self.user.pk)))
+
+    def test_misses_never_read_a_stale_replica(self):
+        with mock.patch.object(replicas.ReplicaRouter, 'db_for_read', return_value='stale-replica'):
+            self.assertEqual(usercache.get_user(self.user.pk), self.user)
+
+    def test_process_local_cache_is_refused(self):
+        with self.settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}):
+            self.assertEqual([error.id for error in usercache.check_shared_cache()], ['utils.E003'])
+
+            usercache.get_user(self.user.pk)
+            self.assertIsNone(cache.get(usercache.cache_key(self.user.pk)))
+
+    def test_password_change_ends_other_sessions(self):
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+
+        user = get_user_model().objects.get(pk=self.user.pk)
+        user.set_password('changed-password')
+        user.save()
+
+        self.assertRedirects(self.client.get(self.url), f'{settings.LOGIN_URL}?next={self.url}')
+
+    def test_saving_a_cached_user_keeps_other_fields(self):
+        EmailBackend().get_user(self.user.pk)
+        user = EmailBackend().get_user(self.user.pk)
+        user.first_name = 'Changed'
+        user.save()
+
+        saved = get_user_model().objects.get(pk=self.user.pk)
+        self.assertEqual(saved.first_name, 'Changed')
+        self.assertEqual(saved.date_joined, self.user.date_joined)
+
+
+class LoginBufferTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user('history', 'history@example.com', 'history-password')
+        # Long interval, so only the explicit flush writes
+        self.buffer = LoginBuffer(history=True, write_behind=True, interval=3600, max_events=100)
+
+    def test_logins_are_written_in_bulk(self):
+        with self.assertNumQueries(0):
+            self.buffer.add(self.user)
+            self.buffer.add(self.user)
+        latest = self.user.last_login
+
+        self.assertEqual(self.buffer.flush(), 2)
+        self.assertEqual(LoginEvent.objects.filter(user=self.user).count(), 2)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.last_login, latest)
+
+    def test_logins_of_deleted_users_are_skipped(self):
+        self.buffer.add(self.user)
+        self.user.delete()
+
+        self.assertEqual(self.buffer.flush(), 0)
+        self.assertFalse(LoginEvent.objects.exists())
+
+    def test_logins_without_history_are_a_single_update(self):
+        buffer = LoginBuffer(history=False, write_behind=False, interval=3600, max_events=100)
+        with self.assertNumQueries(1):
+            buffer.add(self.user)
+
+        self.assertFalse(LoginEvent.objects.exists())
+        self.assertEqual(get_user_model().objects.get(pk=self.user.pk).last_login, self.user.last_login)
+
+    def test_failed_writes_roll_back_the_history(self):
+        buffer = LoginBuffer(history=True, write_behind=False, interval=3600, max_events=100)
+        with mock.patch.object(get_user_model().objects, 'bulk_update', side_effect=DatabaseError('locked')):
+            # Stands in for the request's transaction, which the failed write rolls back
+            with self.assertRaises(DatabaseError), transaction.atomic():
+                buffer.add(self.user)
+
+        self.assertFalse(LoginEvent.objects.exists())
+
+    def test_last_login_never_goes_back(self):
+        self.buffer.add(self.user)
+        # A later login, written by another process before this one flushes
+        later = timezone.now() + timedelta(minutes=1)
+        get_user_model().objects.filter(pk=self.user.pk).update(last_login=later)
+
+        self.assertEqual(self.buffer.flush(), 1)
+        self.assertEqual(get_user_model().objects.get(pk=self.user.pk).last_login, later)
+
+    def test_forked_processes_drop_the_parents_logins(self):
+        self.buffer._events = [LoginEvent(user_id=self.user.pk, logged_in_at=timezone.now())]
+        # As seen by a forked child, the flush thread only runs in the parent
+        self.buffer._pid = os.getpid() + 1
+
+        with mock.patch('threading.Thread') as Thread, mock.patch('atexit.register'):
+            self.buffer.add(self.user)
+        Thread.return_value.start.assert_called_once()
+        self.assertEqual(len(self.buffer._events), 1)
+        self.assertEqual(self.buffer._events[0].logged_in_at, self.user.last_login)
+
+
+class LoginWriteBehindTests(TransactionTestCase):
+    """The flush thread has its own connection, it only sees committed users."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user('behind', 'behind@example.com', 'behind-password')
+
+    def wait_for_logins(self, count: int) -> int:
+        for _ in range(200):
+            written = LoginEvent.objects.filter(user=self.user).count()
+            if written >= count:
+                return written
+            time.sleep(0.01)
+        return written
+
+    def test_logins_are_flushed_in_the_background(self):
+        buffer = LoginBuffer(history=True, write_behind=True, interval=0.05, max_events=100)
+        buffer.add(self.user)
+
+        self.assertEqual(self.wait_for_logins(1), 1)
+        self.assertEqual(get_user_model().objects.get(pk=self.user.pk).last_login, self.user.last_login)
+
+    def test_max_events_trigger_a_flush(self):
+        buffer = LoginBuffer(history=True, write_behind=True, interval=3600, max_events=2)
+        buffer.add(self.user)
+        time.sleep(0.1)
+        self.assertFalse(LoginEvent.objects.exists())
+
+        buffer.add(self.user)
+        self.assertEqual(self.wait_for_logins(2), 2)
+
+
+class EmailLookupTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user('mixed', 'Mixed.Case@Example.com', 'mixed-password')
+
+    def test_lookups_ignore_case(self):
+        User = get_user_model()
+        self.assertEqual(User.objects.by_email(' mixed.case@example.COM').get(), self.user)
+        self.assertEqual(User.objects.get_by_natural_key('MIXED.CASE@EXAMPLE.COM'), self.user)
+        self.assertEqual(EmailBackend().authenticate(None, 'mixed.case@example.com', 'mixed-password'), self.user)
+
+    def test_email_can_be_passed_by_name(self):
+        self.assertEqual(authenticate(None, email='Mixed.Case@example.com', password='mixed-password'), self.user)
+        self.assertIsNone(authenticate(None, password='mixed-password'))
+
+    def test_registering_an_email_in_another_case_fails(self):
+        form = RegisterForm({
+            'username': 'other', 'email': 'MIXED.case@example.com',
+            'password1': 'Register-pass-1', 'password2': 'Register-pass-1',
+        })
+        # UserCreationForm checks the username twice, the email is a single lookup
+        with self.assertNumQueries(3):
+            self.assertEqual(form.errors['email'], ['A user with that email already exists.'])
+
+    def test_lookup_uses_the_index(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('Checks the SQLite query plan.')
+        plan = get_user_model().objects.by_email('mixed.case@example.com').explain()
+        self.assertIn('USING INDEX', plan)
+
+
+class PurgeInactiveUsersTests(TestCase):
+    def create_user(self, name: str, days: int, **fields):
+        user = get_user_model().objects.create_user(name, f'{name}@example.com', is_active=False, **fields)
+        get_user_model().objects.filter(pk=user.pk).update(date_joined=timezone.now() - timedelta(days=days))
+        return user
+
+    def test_only_old_never_activated_accounts_are_deleted(self):
+        self.create_user('abandoned', 30)
+        self.create_user('recent', 1)
+        self.create_user('deactivated', 30, last_login=timezone.now())
+        self.create_user('staff', 30, is_staff=True)
+
+        call_command('purge_inactive_users', dry_run=True, stdout=io.StringIO())
+        self.assertEqual(get_user_model().objects.count(), 4)
+
+        call_command('purge_inactive_users', batch_size=1, sleep=0, stdout=io.StringIO())
+        self.assertQuerySetEqual(
+            get_user_model().objects.order_by('username').values_list('username', flat=True),
+            ['deactivated', 'recent', 'staff'],
+        )
+
+
+class ActivationEmailTests(TestCase):
+    def setUp(self):
+        self.form = RegisterForm({
+            'username': 'mailed', 'email': 'mailed@example.com',
+            'password1': 'Register-pass-1', 'password2': 'Register-pass-1',
+        })
+        self.assertTrue(self.form.is_valid())
+
+    def test_account_is_saved_with_its_email(self):
+        user = self.form.send_email_activation(RequestFactory().get('/'))
+
+        self.assertFalse(get_user_model().objects.get(pk=user.pk).is_active)
+        self.assertEqual(OutboxMessage.objects.get().to, ['mailed@example.com'])
+
+    def test_account_is_rolled_back_when_queueing_fails(self):
+        with mock.patch('mailing.outbox.enqueue', side_effect=DatabaseError('locked')):
+            # Stands in for the request's transaction, which the failure rolls back
+            with self.assertRaises(DatabaseError), transaction.atomic():
+                self.form.send_email_activation(RequestFactory().get('/'))
+
+        self.assertFalse(get_user_model().objects.filter(normalized_email='mailed@example.com').exists())
+
+
+class ActivationLinkTests(TestCase):
+    def setUp(self):
+        # Tokens of earlier tests' users are the same, so their visits may still be cached
+        cache.clear()
+        self.user = get_user_model().objects.create_user('scanned', 'scanned@example.com', is_active=False)
+        self.uidb64 = urlsafe_base64_encode(force_bytes(self.user.pk))
+        self.token = account_activation_token.make_token(self.user)
+
+    def test_repeated_visits_keep_succeeding_without_queries(self):
+        self.assertTrue(activation.activate(self.uidb64, self.token))
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.is_active)
+
+        # The token no longer verifies against the active user, the cache remembers it did
+        with self.assertNumQueries(0):
+            self.assertTrue(activation.activate(self.uidb64, self.token))
+
+    def test_used_links_succeed_without_the_cache(self):
+        self.assertTrue(activation.activate(self.uidb64, self.token))
+        # Another process, or a visit after the cache timeout
+        cache.clear()
+
+        with self.assertNumQueries(1):
+            self.assertTrue(activation.activate(self.uidb64, self.token))
+        self.assertTrue(get_user_model().objects.get(pk=self.user.pk).is_active)
+        self.assertFalse(activation.activate(self.uidb64, 'invalid-token'))
+
+    def test_invalid_links_fail(self):
+        self.assertFalse(activation.activate(self.uidb64, 'invalid-token'))
+        self.assertFalse(activation.activate('invalid', self.token))
+        self.assertFalse(get_user_model().objects.get(pk=self.user.pk).is_active)
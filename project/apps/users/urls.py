@@ -1,6 +1,11 @@
+from django.conf import settings
 from django.urls import path
 from . import views, redirects
 
+# Native async views for ASGI deployments
+if settings.USERS_ASYNC_VIEWS:
+    from . import async_views as views
+
 
 app_name = 'users'
 urlpatterns = []
@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.http import HttpRequest
 
 # Authentication
@@ -9,22 +10,25 @@ from django.contrib.auth.decorators import login_required
 from django.utils.encoding import force_str
 from django.utils.http import urlsafe_base64_decode
 from .tokens import account_activation_token
+from . import activation
 
 # Views
 from django.shortcuts import render, redirect
-from utils.views import get_template, session_required
-from . import urls, forms
+from utils.views import template_view
+from utils.flows import Flow, flow_required
+from utils.pagecache import anonymous_page_cache
+from . import forms
 
 
-# Sessions
-USER_ACTIVATION_SESSION = 'user_activation'
-PASSWORD_RESET_SESSION  = 'password_reset'
+# Flows
+USER_ACTIVATION_FLOW = Flow('user_activation', ttl=settings.PASSWORD_RESET_TIMEOUT)
+PASSWORD_RESET_FLOW  = Flow('password_reset', ttl=settings.PASSWORD_RESET_TIMEOUT)
 
 
 # Authentication
-def login(request: HttpRequest):
-    template = get_template(app=urls.app_name)
-
+@anonymous_page_cache()
+@template_view()
+def login(request: HttpRequest, template: str):
     if request.method == 'GET':
         form = forms.LoginForm()
 
@@ -55,9 +59,9 @@ def logout(request):
 
 
 # Activation
-def register(request: HttpRequest):
-    template = get_template(app=urls.app_name)
-
+@anonymous_page_cache()
+@template_view()
+def register(request: HttpRequest, template: str):
     if request.method == 'GET':
         form = forms.RegisterForm()
 
@@ -65,7 +69,7 @@ def register(request: HttpRequest):
         form = forms.RegisterForm(request.POST)
         if form.is_valid():
             form.send_email_activation(request)
-            request.session[USER_ACTIVATION_SESSION] = True
+            USER_ACTIVATION_FLOW.start(request)
             return redirect('users:login')
 
     return render(request, template, {
@@ -74,48 +78,28 @@ def register(request: HttpRequest):
 
 
 def activation_activate(request: HttpRequest, uidb64: str, token: str):
-    User = get_user_model()
-
-    try:
-        uid = force_str(urlsafe_base64_decode(uidb64))
-        user = User.objects.get(pk=uid)
-    except(TypeError, ValueError, OverflowError, User.DoesNotExist):
-        user = None
-
-    if user and account_activation_token.check_token(user, token):
-        user.is_active = True
-        user.save()
+    if activation.activate(uidb64, token):
         return redirect('users:activation_success')
     return redirect('users:activation_fail')
 
 
-@session_required(USER_ACTIVATION_SESSION, redirect_to='users:login')
-def activation_success(request: HttpRequest):
-    try:
-        del request.session[USER_ACTIVATION_SESSION]
-    except KeyError:
-        pass
-
-    template = get_template(app=urls.app_name)
+@flow_required(USER_ACTIVATION_FLOW, redirect_to='users:login')
+@template_view()
+def activation_success(request: HttpRequest, template: str):
     return render(request, template)
 
 
-@session_required(USER_ACTIVATION_SESSION, redirect_to='users:login')
-def activation_fail(request: HttpRequest):
-    try:
-        del request.session[USER_ACTIVATION_SESSION]
-    except KeyError:
-        pass
-
-    template = get_template(app=urls.app_name)
+@flow_required(USER_ACTIVATION_FLOW, redirect_to='users:login')
+@template_view()
+def activation_fail(request: HttpRequest, template: str):
     return render(request, template)
 
 
 
 # Password management
 @login_required
-def change_password(request: HttpRequest):
-    template = get_template(app=urls.app_name)
+@template_view()
+def change_password(request: HttpRequest, template: str):
     user = request.user
 
     if request.method == 'GET':
@@ -132,8 +116,9 @@ def change_password(request: HttpRequest):
     })
 
 
-def reset_password(request: HttpRequest):
-    template = get_template(app=urls.app_name)
+@anonymous_page_cache()
+@template_view()
+def reset_password(request: HttpRequest, template: str):
     if request.method == 'GET':
         form = forms.PasswordResetForm()
 
@@ -141,7 +126,7 @@ def reset_password(request: HttpRequest):
         form = forms.PasswordResetForm(request.POST)
         if form.is_valid():
             form.send_password_reset(request)
-            request.session[PASSWORD_RESET_SESSION] = True
+            PASSWORD_RESET_FLOW.start(request)
             return redirect('users:login')
 
 
@@ -150,7 +135,8 @@ def reset_password(request: HttpRequest):
     })
 
 
-def reset_password_reset(request: HttpRequest, uidb64: str, token: str):
+@template_view()
+def reset_password_reset(request: HttpRequest, uidb64: str, token: str, template: str):
     User = get_user_model()
 
     try:
@@ -169,30 +155,19 @@ def reset_password_reset(request: HttpRequest, uidb64: str, token: str):
                 form.save()
                 return redirect('users:reset_password_success')
         return redirect('users:reset_password_fail')
-    
-    template = get_template(app=urls.app_name)
+
     return render(request, template, {
         'form': form,
     })
 
 
-@session_required(PASSWORD_RESET_SESSION, redirect_to='users:login')
-def reset_password_success(request: HttpRequest):
-    try:
-        del request.session[PASSWORD_RESET_SESSION]
-    except KeyError:
-        pass
-    
-    template = get_template(app=urls.app_name)
+@flow_required(PASSWORD_RESET_FLOW, redirect_to='users:login')
+@template_view()
+def reset_password_success(request: HttpRequest, template: str):
     return render(request, template)
 
 
-@session_required(PASSWORD_RESET_SESSION, redirect_to='users:login')
-def reset_password_fail(request: HttpRequest):
-    try:
-        del request.session[PASSWORD_RESET_SESSION]
-    except KeyError:
-        pass
-
-    template = get_template(app=urls.app_name)
+@flow_required(PASSWORD_RESET_FLOW, redirect_to='users:login')
+@template_view()
+def reset_password_fail(request: HttpRequest, template: str):
     return render(request, template)
\ No newline at end of file
@@ -0,0 +1,60 @@
+"""
+Throughput of the sync and async 'users' views under the ASGI handler.
+
+Every client logs in repeatedly, which is dominated by password verification.
+Sync views are serialized on the ASGI handler's sync thread, async views await
+the hashing pool concurrently.
+
+Run from the 'project' directory:
+
+    python -m benchmarks.async_views --concurrency 16 --requests 10 --hashing-workers 4
+"""
+
+import argparse
+import asyncio
+import time
+
+from benchmarks.environment import test_database, users_urlconf
+
+
+EMAIL = 'benchmark@example.com'
+PASSWORD = 'benchmark-password-123'
+
+
+async def drive(concurrency: int, requests: int) -> float:
+    from django.test import AsyncClient
+
+    async def client():
+        client = AsyncClient(HTTP_HOST='localhost')
+        for _ in range(requests):
+            response = await client.post('/users/login/', {'email': EMAIL, 'password': PASSWORD})
+            assert response.status_code == 302, response.status_code
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--requests', type=int, default=10, help='Requests sent by every client.')
+    parser.add_argument('--hashing-workers', type=int, default=4)
+    args = parser.parse_args()
+
+    with test_database():
+        from django.test import override_settings
+        from users import async_views, views
+        from users.models import User
+
+        User.objects.create_user(username='benchmark', email=EMAIL, password=PASSWORD)
+
+        total = args.concurrency * args.requests
+        for name, module in [('sync', views), ('async', async_views)]:
+            with override_settings(ROOT_URLCONF=users_urlconf(module), PASSWORD_HASHING_WORKERS=args.hashing_workers):
+                seconds = asyncio.run(drive(args.concurrency, args.requests))
+            print(f'{name:>5}: {total} logins in {seconds:.2f} s, {total / seconds:8.1f} req/s')
+
+
+if __name__ == '__main__':
+    main()
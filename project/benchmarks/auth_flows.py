@@ -0,0 +1,348 @@
+"""
+End-to-end load benchmark of the 'users' auth flows.
+
+Runs login, logout, register, activate, change-password and the reset-password
+round trip in-process against a seeded throwaway database, through the WSGI
+(`django.test.Client`, sync views) and ASGI (`django.test.AsyncClient`, async views)
+request handlers.
+Reports throughput, p50/p95/p99 latency and queries per request, optionally
+traced memory per request, writes them to JSON and compares them to a baseline.
+
+Run from the 'project' directory:
+
+    python -m benchmarks.auth_flows --concurrency 8 --iterations 100 --output results.json
+    python -m benchmarks.auth_flows --baseline results.json --tolerance 0.15
+"""
+
+import argparse
+import asyncio
+import contextvars
+import io
+import json
+import platform
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+import django
+
+from benchmarks.environment import test_database, users_urlconf
+
+
+PASSWORD = 'seed-password'
+NEW_PASSWORD = 'Bench-mark-pass-1'
+FLOWS = ['login', 'logout', 'register', 'activate', 'change_password', 'reset_password']
+INTERFACES = ['wsgi', 'asgi']
+
+
+class RequestStats:
+    def __init__(self):
+        self.queries = 0
+
+
+_stats: contextvars.ContextVar[RequestStats | None] = contextvars.ContextVar('benchmark_stats', default=None)
+
+
+def count_queries(execute, sql, params, many, context):
+    stats = _stats.get()
+    if stats is not None:
+        stats.queries += 1
+    return execute(sql, params, many, context)
+
+
+def install_query_counter(connection, **kwargs):
+    if count_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(count_queries)
+
+
+def percentile(values: list[float], percent: float) -> float:
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, round(percent / 100 * len(values)) - 1))
+    return values[index]
+
+
+class FlowFactory:
+    """
+    Builds the requests of every flow iteration up front, so setup queries aren't measured.
+
+    Every iteration gets its own seeded user, flows changing passwords can't share them.
+    """
+
+    def __init__(self, run: str):
+        from users.models import User
+
+        self.run = run
+        self.users = iter(User.objects.filter(username__startswith='seed', is_active=True).order_by('pk'))
+        self.counter = 0
+
+    def next_user(self):
+        try:
+            return next(self.users)
+        except StopIteration:
+            raise SystemExit('Not enough seeded users, raise --users.')
+
+    def login_step(self, user) -> tuple:
+        return ('post', '/users/login/', {'email': user.email, 'password': PASSWORD}, 302)
+
+    def reset_url(self, prefix: str, user) -> str:
+        from django.utils.encoding import force_bytes
+        from django.utils.http import urlsafe_base64_encode
+        from users.tokens import account_activation_token
+
+        uid = urlsafe_base64_encode(force_bytes(user.pk))
+        return f'/users/{prefix}/{uid}/{account_activation_token.make_token(user)}/'
+
+    def build(self, flow: str) -> list[tuple]:
+        self.counter += 1
+
+        if flow == 'register':
+            name = f'bench_{self.run}_{self.counter}'
+            return [('post', '/users/register/', {
+                'username': name,
+                'email': f'{name}@example.com',
+                'password1': NEW_PASSWORD,
+                'password2': NEW_PASSWORD,
+            }, 302)]
+
+        user = self.next_user()
+        if flow == 'login':
+            return [self.login_step(user)]
+        if flow == 'logout':
+            return [self.login_step(user), ('get', '/users/logout/', None, 302)]
+        if flow == 'activate':
+            user.is_active = False
+            user.save(update_fields=['is_active'])
+            return [('get', self.reset_url('activate', user), None, 302)]
+        if flow == 'change_password':
+            data = {'new_password1': NEW_PASSWORD, 'new_password2': NEW_PASSWORD}
+            return [
+                self.login_step(user),
+                ('get', '/users/change-password/', None, 200),
+                ('post', '/users/change-password/', data, 302),
+            ]
+        if flow == 'reset_password':
+            url = self.reset_url('reset-password', user)
+            data = {'new_password1': NEW_PASSWORD, 'new_password2': NEW_PASSWORD}
+            return [
+                ('post', '/users/reset-password/', {'email': user.email}, 302),
+                ('get', url, None, 200),
+                ('post', url, data, 302),
+                ('get', '/users/reset-password/success/', None, 200),
+            ]
+        raise ValueError(f'Unknown flow {flow!r}')
+
+
+def check(response, expected: int, method: str, path: str) -> None:
+    if response.status_code != expected:
+        raise AssertionError(f'{method.upper()} {path} returned {response.status_code}, expected {expected}')
+
+
+def run_wsgi(iterations: list[list[tuple]], concurrency: int) -> tuple[list[float], list[int], float]:
+    from django.test import Client
+
+    latencies, queries = [], []
+
+    def iteration(steps):
+        client = Client()
+        for method, path, data, expected in steps:
+            stats = RequestStats()
+            token = _stats.set(stats)
+            started = time.perf_counter()
+            response = getattr(client, method)(path, data)
+            latencies.append(time.perf_counter() - started)
+            _stats.reset(token)
+            queries.append(stats.queries)
+            check(response, expected, method, path)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(iteration, iterations))
+    return latencies, queries, time.perf_counter() - started
+
+
+def run_asgi(iterations: list[list[tuple]], concurrency: int) -> tuple[list[float], list[int], float]:
+    from django.test import AsyncClient
+
+    latencies, queries = [], []
+
+    async def iteration(steps, semaphore):
+        async with semaphore:
+            client = AsyncClient()
+            for method, path, data, expected in steps:
+                stats = RequestStats()
+                _stats.set(stats)
+                started = time.perf_counter()
+                response = await getattr(client, method)(path, data)
+                latencies.append(time.perf_counter() - started)
+                queries.append(stats.queries)
+                check(response, expected, method, path)
+
+    async def main():
+        semaphore = asyncio.Semaphore(concurrency)
+        await asyncio.gather(*(iteration(steps, semaphore) for steps in iterations))
+
+    started = time.perf_counter()
+    asyncio.run(main())
+    return latencies, queries, time.perf_counter() - started
+
+
+def measure_allocations(iterations: list[list[tuple]]) -> float:
+    """Returns the average peak of traced memory per request in KiB, measured sequentially."""
+
+    from django.test import Client
+
+    peaks = []
+    tracemalloc.start()
+    try:
+        for steps in iterations:
+            client = Client()
+            for method, path, data, expected in steps:
+                tracemalloc.reset_peak()
+                baseline, _ = tracemalloc.get_traced_memory()
+                response = getattr(client, method)(path, data)
+                _, peak = tracemalloc.get_traced_memory()
+                peaks.append((peak - baseline) / 1024)
+                check(response, expected, method, path)
+    finally:
+        tracemalloc.stop()
+    return statistics.mean(peaks)
+
+
+def summarize(latencies: list[float], queries: list[int], seconds: float, iterations: int) -> dict:
+    return {
+        'iterations': iterations,
+        'requests': len(latencies),
+        'seconds': round(seconds, 4),
+        'throughput_rps': round(len(latencies) / seconds, 2),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 3),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 3),
+        'queries_per_request': round(statistics.mean(queries), 2),
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    """
+    Returns descriptions of metrics that got worse than the baseline by more than `tolerance`.
+
+    Query counts are compared exactly, every additional query is a regression.
+    """
+
+    regressions = []
+    for interface, flows in results['results'].items():
+        for flow, metrics in flows.items():
+            base = baseline.get('results', {}).get(interface, {}).get(flow)
+            if not base:
+                continue
+
+            label = f'{interface}/{flow}'
+            if metrics['throughput_rps'] < base['throughput_rps'] * (1 - tolerance):
+                regressions.append(f"{label}: throughput {base['throughput_rps']} -> {metrics['throughput_rps']} req/s")
+            for key in ['p50_ms', 'p95_ms', 'p99_ms']:
+                if metrics[key] > base[key] * (1 + tolerance):
+                    regressions.append(f'{label}: {key} {base[key]} -> {metrics[key]}')
+            if metrics['queries_per_request'] > base['queries_per_request']:
+                regressions.append(
+                    f"{label}: queries per request {base['queries_per_request']} -> {metrics['queries_per_request']}"
+                )
+            if 'alloc_kib_per_request' in base and 'alloc_kib_per_request' in metrics:
+                if metrics['alloc_kib_per_request'] > base['alloc_kib_per_request'] * (1 + tolerance):
+                    regressions.append(
+                        f"{label}: KiB per request {base['alloc_kib_per_request']} -> {metrics['alloc_kib_per_request']}"
+                    )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--flows', default=','.join(FLOWS), help='Comma separated flows to run.')
+    parser.add_argument('--interfaces', default=','.join(INTERFACES), help='Comma separated: wsgi, asgi.')
+    parser.add_argument('--iterations', type=int, default=100, help='Iterations of every flow per interface.')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--users', type=int, default=10_000, help='Seeded users, raised to what the run needs.')
+    parser.add_argument('--fast-hasher', action='store_true', help='Use MD5 hashing to measure everything else.')
+    parser.add_argument('--allocations', action='store_true', help='Also measure traced memory per WSGI request.')
+    parser.add_argument('--output', help='Write results to this JSON file.')
+    parser.add_argument('--baseline', help='Compare results to this JSON file.')
+    parser.add_argument('--tolerance', type=float, default=0.10, help='Allowed relative slowdown.')
+    args = parser.parse_args()
+
+    flows = [flow for flow in args.flows.split(',') if flow]
+    interfaces = [interface for interface in args.interfaces.split(',') if interface]
+    allocation_iterations = min(20, args.iterations) if args.allocations and 'wsgi' in interfaces else 0
+    needed = len(interfaces) * len(flows) * args.iterations + len(flows) * allocation_iterations
+
+    # Concurrent SQLite connections lock each other out of a shared in-memory database
+    with tempfile.TemporaryDirectory() as directory, test_database(os.path.join(directory, 'benchmark.sqlite3')):
+        from django.core.management import call_command
+        from django.db import connections
+        from django.db.backends.signals import connection_created
+        from django.test import override_settings
+        from users import async_views, views
+
+        hashers = ['django.contrib.auth.hashers.MD5PasswordHasher'] if args.fast_hasher else None
+        with override_settings(**({'PASSWORD_HASHERS': hashers} if hashers else {})):
+            call_command('seed_users', max(args.users, needed), active_ratio=1, stdout=io.StringIO())
+
+            connection_created.connect(install_query_counter)
+            for connection in connections.all():
+                install_query_counter(connection)
+
+            factory = FlowFactory(run=str(int(time.time())))
+            results = {interface: {} for interface in interfaces}
+            for interface in interfaces:
+                for flow in flows:
+                    iterations = [factory.build(flow) for _ in range(args.iterations)]
+                    runner, module = (run_wsgi, views) if interface == 'wsgi' else (run_asgi, async_views)
+                    with override_settings(ROOT_URLCONF=users_urlconf(module)):
+                        latencies, queries, seconds = runner(iterations, args.concurrency)
+                    results[interface][flow] = summarize(latencies, queries, seconds, args.iterations)
+
+            # tracemalloc slows everything down, so allocations get their own sequential pass
+            if args.allocations and 'wsgi' in results:
+                for flow in flows:
+                    with override_settings(ROOT_URLCONF=users_urlconf(views)):
+                        kib = measure_allocations([factory.build(flow) for _ in range(allocation_iterations)])
+                    results['wsgi'][flow]['alloc_kib_per_request'] = round(kib, 2)
+
+    report = {
+        'meta': {
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'platform': platform.platform(),
+            'concurrency': args.concurrency,
+            'iterations': args.iterations,
+            'fast_hasher': args.fast_hasher,
+        },
+        'results': results,
+    }
+
+    for interface, flow_results in results.items():
+        for flow, metrics in flow_results.items():
+            print(
+                f"{interface:>4} {flow:>16}: {metrics['throughput_rps']:9.1f} req/s  "
+                f"p50 {metrics['p50_ms']:8.2f} ms  p95 {metrics['p95_ms']:8.2f} ms  p99 {metrics['p99_ms']:8.2f} ms  "
+                f"{metrics['queries_per_request']:5.1f} queries/req"
+                + (f"  {metrics['alloc_kib_per_request']:8.1f} KiB/req" if 'alloc_kib_per_request' in metrics else '')
+            )
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions = compare(report, json.load(file), args.tolerance)
+        for regression in regressions:
+            print(f'REGRESSION {regression}')
+        if regressions:
+            sys.exit(1)
+        print('No regressions against the baseline.')
+
+
+if __name__ == '__main__':
+    main()
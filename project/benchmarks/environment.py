@@ -0,0 +1,59 @@
+"""
+Helpers shared by benchmarks that need a configured Django project.
+"""
+
+import contextlib
+import os
+
+import django
+
+
+@contextlib.contextmanager
+def test_database(name: str | None = None):
+    """
+    Sets up Django against a throwaway test database, destroyed on exit.
+
+    Parameters
+    ----------
+    name : str, optional
+        Test database name, e.g. a file path so SQLite threads don't share an in-memory database.
+    """
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+    django.setup()
+
+    from django.db import connection
+    from django.test.utils import setup_test_environment, teardown_test_environment
+
+    if name:
+        connection.settings_dict['TEST']['NAME'] = name
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+def users_urlconf(views):
+    """
+    Builds a URLconf serving the 'users' routes from the given views module.
+
+    Parameters
+    ----------
+    views : module
+        Either `users.views` or `users.async_views`.
+    """
+
+    import types
+    from django.urls import include, path
+    from users import urls
+
+    routes = [
+        path(str(pattern.pattern), getattr(views, pattern.callback.__name__), name=pattern.name)
+        for pattern in urls.PATHS
+    ]
+    urlconf = types.ModuleType(f'benchmark_urls_{views.__name__}')
+    urlconf.urlpatterns = [path('users/', include((routes, urls.app_name)))]
+    return urlconf
@@ -0,0 +1,120 @@
+"""
+Concurrent writer stress test for SQLite backends.
+
+Every thread uses its own connection to a fresh database file and repeatedly
+reads and inserts a row in a transaction, then updates it outside of a transaction.
+The production profile uses `SQLITE_PRODUCTION_OPTIONS`, the default profile uses Django's
+stock SQLite settings.
+
+Run from the 'project' directory:
+
+    python -m benchmarks.sqlite_writers --threads 16 --writes 200
+    python -m benchmarks.sqlite_writers --threads 16 --writes 200 --default-profile
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+
+def stress(path: str, threads: int, writes: int, production: bool = True) -> tuple[int, float]:
+    """
+    Runs writer threads against the SQLite database at `path`.
+
+    Parameters
+    ----------
+    path : str
+        Path to the database file, created if it doesn't exist.
+    threads : int
+        Number of concurrent writer threads.
+    writes : int
+        Number of insert and update pairs per thread.
+    production : bool, optional
+        Whether to use the production profile or Django's defaults (default is True).
+
+    Returns
+    -------
+    tuple of int and float
+        Number of "database is locked" errors and elapsed seconds.
+    """
+
+    from django.db import OperationalError, connections, transaction
+
+    from django.conf import settings
+
+    alias = f'stress_{os.path.basename(path)}'
+    if production:
+        database = {
+            'ENGINE': 'utils.sqlite',
+            'NAME': path,
+            'OPTIONS': settings.SQLITE_PRODUCTION_OPTIONS,
+        }
+    else:
+        database = {'ENGINE': 'django.db.backends.sqlite3', 'NAME': path}
+
+    connections.settings[alias] = connections.configure_settings({
+        'default': connections.settings['default'],
+        alias: database,
+    })[alias]
+
+    with connections[alias].cursor() as cursor:
+        cursor.execute('CREATE TABLE IF NOT EXISTS stress (id INTEGER PRIMARY KEY, thread INTEGER, n INTEGER)')
+
+    errors = []
+    barrier = threading.Barrier(threads)
+
+    def writer(thread: int):
+        barrier.wait()
+        connection = connections[alias]
+        for n in range(writes):
+            try:
+                with transaction.atomic(using=alias), connection.cursor() as cursor:
+                    cursor.execute('SELECT COUNT(*) FROM stress WHERE thread = %s', [thread])
+                    cursor.execute('INSERT INTO stress (thread, n) VALUES (%s, %s)', [thread, n])
+                with connection.cursor() as cursor:
+                    cursor.execute('UPDATE stress SET n = n + 1 WHERE thread = %s AND n = %s', [thread, n])
+            except OperationalError as e:
+                if 'locked' not in str(e):
+                    raise
+                errors.append(e)
+        connection.close()
+
+    started = time.perf_counter()
+    workers = [threading.Thread(target=writer, args=(thread,)) for thread in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - started
+
+    connections[alias].close()
+    return len(errors), elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--default-profile', action='store_true', help="Use Django's stock SQLite settings.")
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--writes', type=int, default=200)
+    args = parser.parse_args()
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+    import django
+    django.setup()
+
+    with tempfile.TemporaryDirectory() as directory:
+        errors, seconds = stress(
+            os.path.join(directory, 'stress.sqlite3'), args.threads, args.writes, production=not args.default_profile
+        )
+
+    profile = 'default' if args.default_profile else 'production'
+    total = args.threads * args.writes * 2
+    print(f'{profile}: {total} writes by {args.threads} threads in {seconds:.2f} s, {errors} lock errors')
+    sys.exit(1 if errors else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,38 @@
+"""
+Micro-benchmark of view template resolution.
+
+Compares the former `inspect.stack()` based lookup with `utils.views.template_view`.
+
+Run from the 'project' directory:
+
+    python -m benchmarks.template_resolution
+"""
+
+import inspect
+import timeit
+
+from utils.views import template_view
+
+
+def legacy_get_template(app: str) -> str:
+    template_name = inspect.stack()[1][3].replace('_', '-')
+    return f'{app}/{template_name}.html'
+
+
+def reset_password_legacy(request):
+    return legacy_get_template(app='users')
+
+
+@template_view(app='users')
+def reset_password(request, template: str):
+    return template
+
+
+def main(number: int = 2_000):
+    for name, view in [('inspect.stack()', reset_password_legacy), ('template_view', reset_password)]:
+        seconds = min(timeit.repeat(lambda: view(None), number=number, repeat=5))
+        print(f'{name:>16}: {seconds / number * 1_000_000:10.2f} us/call')
+
+
+if __name__ == '__main__':
+    main()
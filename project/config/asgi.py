@@ -13,4 +13,10 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
-application = get_asgi_application()
+from utils.assets import EarlyHintsMiddleware
+
+application = EarlyHintsMiddleware(get_asgi_application())
+
+# Prime URLs, templates, hashers and password validators before reporting ready
+from utils import warmup
+warmup.run()
@@ -36,10 +36,16 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles',
 
     'users',
+    'mailing',
 ]
 
 MIDDLEWARE = [
+    'utils.metrics.MetricsMiddleware',
+    'utils.logs.RequestIDMiddleware',
+    'utils.profiling.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'utils.staticfiles.StaticFilesMiddleware',
+    'utils.replicas.ReplicaPinningMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -50,7 +56,8 @@ MIDDLEWARE = [
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # Django's backend, measuring render times for 'utils.metrics'
+        'BACKEND': 'utils.metrics.DjangoTemplates',
         'DIRS': [
             os.path.join(BASE_DIR, 'templates')
         ],
@@ -62,12 +69,40 @@ TEMPLATES = [
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
             ],
+            'libraries': {
+                'assets': 'utils.assets',
+            },
         },
     },
 ]
 
+# Steps run by 'config.wsgi' and 'config.asgi' before the worker reports ready on '/health/ready'
+WARMUP_STEPS = [
+    'utils.warmup.warm_urls',
+    'utils.warmup.warm_templates',
+    'utils.warmup.warm_password_hashers',
+    'utils.warmup.warm_password_validators',
+]
+
 STATIC_URL = '/static/'
 STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+
+# Fingerprinted file names and '.gz' variants written by 'collectstatic', see 'utils.staticfiles'
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'utils.staticfiles.CompressedManifestStaticFilesStorage',
+    },
+}
+
+# Serve 'STATIC_ROOT' from Django with immutable caching, for deployments without a front proxy
+STATIC_SERVE = os.getenv('STATIC_SERVE') == '1'
+
+# Stylesheets up to this size are inlined by '{% stylesheet %}', larger ones are linked and preloaded
+ASSETS_INLINE_MAX_BYTES = 4096
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
@@ -84,6 +119,75 @@ DATABASES = {
     }
 }
 
+# Production SQLite profile: WAL, tuned pragmas, persistent connections and writes
+# queued within the process instead of failing with "database is locked"
+SQLITE_PRODUCTION = os.getenv('SQLITE_PRODUCTION', '') == '1'
+SQLITE_PRODUCTION_OPTIONS = {
+    'timeout': 20,
+    'transaction_mode': 'IMMEDIATE',
+    'init_command': (
+        'PRAGMA journal_mode=WAL;'
+        'PRAGMA busy_timeout=20000;'
+        'PRAGMA synchronous=NORMAL;'
+        'PRAGMA mmap_size=134217728;'
+        'PRAGMA cache_size=-20000;'
+        'PRAGMA temp_store=MEMORY;'
+    ),
+}
+
+if SQLITE_PRODUCTION:
+    DATABASES['default'].update({
+        'ENGINE': 'utils.sqlite',
+        'CONN_MAX_AGE': None,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': SQLITE_PRODUCTION_OPTIONS,
+    })
+
+# Read replicas, reads of 'REPLICA_APPS' models are spread over 'DATABASE_REPLICAS'
+# For local testing 'SQLITE_REPLICA=1' adds a file copy kept fresh by 'manage.py sync_replica'
+DATABASE_ROUTERS = ['utils.replicas.ReplicaRouter']
+DATABASE_REPLICAS = []
+REPLICA_APPS = ['users']
+REPLICA_PIN_SECONDS = 5
+
+if os.getenv('SQLITE_REPLICA', '') == '1':
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'NAME': BASE_DIR / 'db.replica.sqlite3',
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append('replica')
+
+
+# Caching
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+# Only cached with a cache backend shared by all processes, see 'utils.roles'
+# Bounds how long membership changes made without signals, e.g. raw SQL, go unnoticed
+ROLES_CACHE_TIMEOUT = 60 * 5
+
+# Users loaded for authenticated requests, see 'utils.usercache'
+# Needs a cache backend shared by all processes, the default one is local to each process
+USER_CACHE_ENABLED = os.getenv('USER_CACHE') == '1'
+# Bounds how long changes made without saving the model, e.g. 'QuerySet.update()', go unnoticed
+USER_CACHE_TIMEOUT = 60 * 5
+
+# Pages of anonymous form views, see 'utils.pagecache'
+# Set 'RELEASE' on deploy so workers share pages, otherwise every process start invalidates them
+PAGE_CACHE_VERSION = os.getenv('RELEASE', '')
+PAGE_CACHE_TIMEOUT = 60 * 60 * 24 # One day
+
+
+# Sessions
+# Anonymous sessions holding only these keys live in a signed cookie, see 'utils.sessions'
+SESSION_ENGINE = 'utils.sessions'
+HYBRID_SESSION_COOKIE_KEYS = ['_flows']
+HYBRID_SESSION_COOKIE_MAX_SIZE = 1024
+
 
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
@@ -102,6 +206,11 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# Process pool for password hashing and verification, 0 hashes on the request thread
+PASSWORD_HASHING_WORKERS = 0
+PASSWORD_HASHING_MAX_PENDING = 64
+
+
 # Internationalization
 LANGUAGE_CODE = 'en-us'
 TIME_ZONE = 'UTC'
@@ -115,9 +224,25 @@ LOGIN_URL = '/users/login/'
 AUTH_USER_MODEL = 'users.User'
 AUTHENTICATION_BACKENDS = ['users.backends.EmailBackend']
 
+# Serve 'users' views from 'users.async_views', meant for ASGI deployments
+USERS_ASYNC_VIEWS = False
+
+# Login history and 'last_login', see 'users.logins'
+# History adds an INSERT to every login, unless written behind
+LOGIN_HISTORY = os.getenv('LOGIN_HISTORY', '') == '1'
+# Write-behind keeps logins in memory and writes them in bulk from a background thread
+LOGIN_WRITE_BEHIND = os.getenv('LOGIN_WRITE_BEHIND', '') == '1'
+LOGIN_FLUSH_INTERVAL = 5 # Seconds
+LOGIN_FLUSH_MAX_EVENTS = 500
+
+# Accounts never activated are deleted after this many seconds by 'manage.py purge_inactive_users'
+USERS_PURGE_INACTIVE_AFTER = 60 * 60 * 24 * 7 # One week
+
 
 # Emailing
 PASSWORD_RESET_TIMEOUT = 144_000 # One day
+# Verified activation links keep working for repeated visits, e.g. by mail scanners, see 'users.activation'
+ACTIVATION_LINK_CACHE_TIMEOUT = 60 * 10
 
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
 EMAIL_HOST = 'smtp.gmail.com'
@@ -126,16 +251,79 @@ EMAIL_HOST_USER = os.getenv('EMAIL')
 EMAIL_HOST_PASSWORD = os.getenv('EMAIL_PASSWORD')
 EMAIL_USE_TLS = True
 EMAIL_PORT = 587
+EMAIL_TIMEOUT = 10
+
+# Outbox delivery, see 'manage.py run_mail_worker'
+MAILING_BATCH_SIZE = 50
+MAILING_MAX_ATTEMPTS = 5
+MAILING_RETRY_BACKOFF = 30 # Seconds, doubled on every retry
+MAILING_LEASE = 300
+MAILING_POLL_INTERVAL = 5
+
+
+# Metrics, see 'utils.metrics'
+# '/metrics' is served to clients from these networks, and to requests sending 'Authorization: Bearer <METRICS_TOKEN>'
+METRICS_ALLOWED_NETWORKS = ['127.0.0.0/8', '::1/128']
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
+
+# Profiling, see 'utils.profiling'
+# Fraction of requests profiled, 0 only profiles requests carrying a 'manage.py profile_token' token
+PROFILING_SAMPLE_RATE = float(os.getenv('PROFILING_SAMPLE_RATE', 0))
+PROFILING_MODE = 'cprofile' # Or 'sample' for collapsed stacks of a wall-clock sampler
+PROFILING_SAMPLE_INTERVAL = 0.005 # Seconds between stack samples
+PROFILING_HEADER = 'X-Profile-Token'
+PROFILING_TOKEN_MAX_AGE = 60 * 60
+PROFILING_DIR = BASE_DIR / 'profiles'
+PROFILING_MAX_BYTES = 100 * 1024 * 1024
 
 
 # Logging
+# Records are queued on the logging thread and written as JSON lines by a listener thread, see 'utils.logs'
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
     'formatters': {
+        'json': {
+            '()': 'utils.logs.JSONFormatter',
+        },
+    },
+    'filters': {
+        'request_id': {
+            '()': 'utils.logs.RequestIDFilter',
+        },
+        # Share of records below WARNING kept for noisy loggers
+        'sampling': {
+            '()': 'utils.logs.SamplingFilter',
+            'rates': {
+                'django.db.backends': 0.01,
+                'mailing.worker': 0.1,
+            },
+        },
     },
     'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+            'formatter': 'json',
+        },
+        # Filters run on the logging thread, the request ID is only known there
+        'queue': {
+            '()': 'utils.logs.QueueHandler',
+            'handlers': ['cfg://handlers.console'],
+            'filters': ['sampling', 'request_id'],
+        },
+    },
+    'root': {
+        'handlers': ['queue'],
+        'level': LOG_LEVEL,
     },
     'loggers': {
-    }, 
+        'django': {
+            'handlers': ['queue'],
+            'level': LOG_LEVEL,
+            'propagate': False,
+        },
+    },
 }
\ No newline at end of file
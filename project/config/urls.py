@@ -2,11 +2,14 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
+from utils import health, metrics
 
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('users/', include('users.urls')),
+    path('health/ready', health.ready, name='health_ready'),
+    path('metrics', metrics.view, name='metrics'),
 ]
 
 
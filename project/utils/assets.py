@@ -0,0 +1,189 @@
+"""
+Stylesheets inlined at template compile time, with preload hints for the rest.
+
+Loaded in templates as the 'assets' library:
+
+    {% load assets %}
+    {% stylesheet 'users/styles/login.css' %}
+
+Stylesheets up to `ASSETS_INLINE_MAX_BYTES` are inlined into a `<style>` element when the
+template is compiled, larger ones become a `<link>`. Views decorated with `template_view`
+announce those in a `Link: rel=preload` header, and `EarlyHintsMiddleware` sends them as
+103 Early Hints before the view runs on ASGI servers supporting it.
+"""
+
+from django import template
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.template import loader
+from django.template.base import VariableNode
+from django.template.loader_tags import BlockNode, ExtendsNode, IncludeNode
+from django.templatetags.static import static
+from django.urls import Resolver404, get_resolver
+from django.utils.html import format_html
+from django.utils.safestring import mark_safe
+
+import functools
+
+
+register = template.Library()
+
+
+def can_inline(css: str) -> bool:
+    # Relative url() and @import references would resolve against the page instead of the stylesheet
+    return '</' not in css and 'url(' not in css and '@import' not in css
+
+
+class StylesheetNode(template.Node):
+    """Renders markup decided once, when the template is compiled."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.preload = None
+
+        location = finders.find(path)
+        if not location:
+            raise template.TemplateSyntaxError(f"Stylesheet '{path}' does not exist.")
+        with open(location, encoding='utf-8') as file:
+            css = file.read()
+
+        if not css.strip():
+            self.html = ''
+        elif len(css.encode()) <= settings.ASSETS_INLINE_MAX_BYTES and can_inline(css):
+            self.html = mark_safe(f'<style>{css}</style>')
+        else:
+            self.preload = static(path)
+            self.html = format_html('<link rel="stylesheet" href="{}">', self.preload)
+
+    def render(self, context):
+        return self.html
+
+
+@register.tag
+def stylesheet(parser, token):
+    """
+    Inlines or links a static stylesheet, e.g. {% stylesheet 'global/styles/reset.css' %}.
+    """
+
+    bits = token.split_contents()
+    if len(bits) != 2 or bits[1][0] not in '\'"' or bits[1][0] != bits[1][-1]:
+        raise template.TemplateSyntaxError("'stylesheet' takes a single quoted static path.")
+    return StylesheetNode(bits[1][1:-1])
+
+
+def constant(expression) -> str | None:
+    """Returns the value of a template name expression when it's a literal, None otherwise."""
+
+    if expression.is_var or expression.filters:
+        return None
+    return expression.var
+
+
+def is_block_super(node) -> bool:
+    return isinstance(node, VariableNode) and getattr(node.filter_expression.var, 'var', None) == 'block.super'
+
+
+def collect_preloads(nodelist, preloads: list[str], blocks: dict[str, list[BlockNode]] = None) -> None:
+    """
+    Adds URLs of stylesheets linked by a template, its parents and includes to `preloads`.
+
+    `blocks` holds the blocks of child templates by name, the most derived first. Only
+    templates with literal names are followed.
+    """
+
+    blocks = blocks or {}
+    for node in nodelist.get_nodes_by_type(ExtendsNode):
+        name = constant(node.parent_name)
+        if name:
+            # A child only renders its blocks, in place of those of the parent
+            children = {**blocks, **{
+                block_name: [*blocks.get(block_name, []), block] for block_name, block in node.blocks.items()
+            }}
+            collect_preloads(loader.get_template(name).template.nodelist, preloads, children)
+        return
+
+    chains = {
+        block.name: [*blocks.get(block.name, []), block]
+        for block in nodelist.get_nodes_by_type(BlockNode)
+    }
+    collect_rendered(nodelist, preloads, chains)
+
+
+def collect_rendered(nodelist, preloads: list[str], chains: dict[str, list[BlockNode]], supers: list[BlockNode] = ()) -> None:
+    """Adds stylesheets rendered by `nodelist`, `supers` are the blocks '{{ block.super }}' renders."""
+
+    for node in nodelist:
+        if isinstance(node, StylesheetNode):
+            if node.preload and node.preload not in preloads:
+                preloads.append(node.preload)
+        elif isinstance(node, BlockNode):
+            # Only the most derived block renders, parents' blocks only through '{{ block.super }}'
+            chain = chains.get(node.name, [node])
+            collect_rendered(chain[0].nodelist, preloads, chains, chain[1:])
+        elif is_block_super(node):
+            if supers:
+                collect_rendered(supers[0].nodelist, preloads, chains, supers[1:])
+        elif isinstance(node, IncludeNode):
+            name = constant(node.template)
+            if name:
+                collect_preloads(loader.get_template(name).template.nodelist, preloads)
+        else:
+            for attr in node.child_nodelists:
+                child = getattr(node, attr, None)
+                if child:
+                    collect_rendered(child, preloads, chains, supers)
+
+
+@functools.cache
+def preloads(template_name: str) -> tuple[str, ...]:
+    """
+    Returns URLs of stylesheets linked rather than inlined by a template, its parents and includes.
+
+    Computed once per template and process.
+    """
+
+    found = []
+    collect_preloads(loader.get_template(template_name).template.nodelist, found)
+    return tuple(found)
+
+
+@functools.cache
+def preload_header(template_name: str) -> str:
+    """Returns the `Link` header value preloading stylesheets of a template, empty when there are none."""
+
+    return ', '.join(f'<{url}>; rel=preload; as=style' for url in preloads(template_name))
+
+
+class EarlyHintsMiddleware:
+    """
+    ASGI middleware sending preload links of the view's template as 103 Early Hints.
+
+    Only used with servers offering the 'http.response.early_hint' extension, such as Hypercorn,
+    and for views decorated with `template_view`.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope['type'] == 'http'
+            and scope['method'] == 'GET'
+            and 'http.response.early_hint' in scope.get('extensions', {})
+        ):
+            links = self.links(scope['path'][len(scope.get('root_path', '')):])
+            if links:
+                await send({'type': 'http.response.early_hint', 'links': links})
+        await self.app(scope, receive, send)
+
+
+    def links(self, path: str) -> list[bytes]:
+        try:
+            match = get_resolver().resolve(path)
+        except Resolver404:
+            return []
+
+        template_name = getattr(match.func, 'template', None)
+        if not template_name:
+            return []
+        return [f'<{url}>; rel=preload; as=style'.encode() for url in preloads(template_name)]
@@ -0,0 +1,145 @@
+"""
+Query, template render and session write budgets of views.
+
+Budgets are declared per URL name in a JSON file, e.g. {"users:login": {"queries": 4,
+"templates": 3, "session_writes": 1}}, and checked by tests recording a request with `record()`.
+"""
+
+from django.conf import settings
+from django.db import connections
+from django.test.signals import template_rendered
+from importlib import import_module
+
+import contextlib
+import functools
+import json
+import os
+import threading
+import traceback
+
+
+LIMITS = ['queries', 'templates', 'session_writes']
+
+
+class Query:
+    def __init__(self, sql: str, origin: list[traceback.FrameSummary]):
+        self.sql = sql
+        self.origin = origin
+
+    def __str__(self) -> str:
+        lines = [self.sql]
+        lines += [f'    {frame.filename}:{frame.lineno} in {frame.name}' for frame in self.origin]
+        return '\n'.join(lines)
+
+
+class Usage:
+    def __init__(self):
+        self.queries: list[Query] = []
+        self.templates: list[str] = []
+        self.session_writes = 0
+
+    def as_dict(self) -> dict[str, int]:
+        return {
+            'queries': len(self.queries),
+            'templates': len(self.templates),
+            'session_writes': self.session_writes,
+        }
+
+
+def project_frames() -> list[traceback.FrameSummary]:
+    """Returns frames of the current stack inside the project, without this module."""
+
+    base_dir = str(settings.BASE_DIR)
+    entry_point = os.path.join(base_dir, 'manage.py')
+    return [
+        frame for frame in traceback.extract_stack()
+        if frame.filename.startswith(base_dir) and frame.filename not in (__file__, entry_point)
+    ]
+
+
+@contextlib.contextmanager
+def record():
+    """
+    Records queries, template renders and session writes of the current thread.
+
+    Yields
+    ------
+    Usage
+        Filled in while the block runs.
+
+    Notes
+    -----
+    - Template renders are only reported with the test environment set up, as under the test runner.
+    - Session writes count saves of the `SESSION_ENGINE` store, nested saves count once.
+    - The store's `save` is replaced and the `template_rendered` receiver connected for the whole
+      process while recording, both skip other threads.
+    """
+
+    usage = Usage()
+    thread = threading.get_ident()
+
+    def execute(execute, sql, params, many, context):
+        usage.queries.append(Query(sql, project_frames()))
+        return execute(sql, params, many, context)
+
+    def rendered(sender, template, context, **kwargs):
+        if threading.get_ident() == thread:
+            usage.templates.append(template.name)
+
+    store = import_module(settings.SESSION_ENGINE).SessionStore
+    save = store.save
+    depth = 0
+
+    @functools.wraps(save)
+    def counting_save(self, *args, **kwargs):
+        nonlocal depth
+        if threading.get_ident() != thread:
+            return save(self, *args, **kwargs)
+
+        depth += 1
+        try:
+            return save(self, *args, **kwargs)
+        finally:
+            depth -= 1
+            if not depth:
+                usage.session_writes += 1
+
+    with contextlib.ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(execute))
+
+        template_rendered.connect(rendered)
+        stack.callback(template_rendered.disconnect, rendered)
+
+        store.save = counting_save
+        stack.callback(setattr, store, 'save', save)
+
+        yield usage
+
+
+def load(path: str | os.PathLike) -> dict[str, dict[str, int]]:
+    with open(path) as file:
+        return json.load(file)
+
+
+def check(usage: Usage, budget: dict[str, int]) -> list[str]:
+    """
+    Compares recorded usage with a budget.
+
+    Returns
+    -------
+    list of str
+        A description of every exceeded limit, with the offending SQL and where it came from.
+    """
+
+    errors = []
+    used = usage.as_dict()
+    for limit in LIMITS:
+        if limit in budget and used[limit] > budget[limit]:
+            errors.append(f'{used[limit]} {limit.replace("_", " ")}, budget is {budget[limit]}')
+
+    if used['queries'] > budget.get('queries', used['queries']):
+        errors += [f'Query {number}: {query}' for number, query in enumerate(usage.queries, 1)]
+    if used['templates'] > budget.get('templates', used['templates']):
+        errors.append(f'Templates: {", ".join(map(str, usage.templates))}')
+    return errors
@@ -0,0 +1,54 @@
+"""
+Helpers of the caches kept in Django's cache backends, see `utils.roles`, `utils.usercache`,
+`utils.pagecache` and `utils.sessions`.
+"""
+
+from django.core.cache import DEFAULT_CACHE_ALIAS, caches
+from django.core.cache.backends.locmem import LocMemCache
+
+import threading
+
+
+# Counters of every cache by name, served on '/metrics'
+STATS: dict[str, 'CacheStats'] = {}
+
+
+class CacheStats:
+    """
+    Thread-safe hit and miss counters of a cache.
+
+    Parameters
+    ----------
+    name : str
+        Name the counters are reported under, registered in `STATS`.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        STATS[name] = self
+
+    def hit(self):
+        with self._lock:
+            self.hits += 1
+
+    def miss(self):
+        with self._lock:
+            self.misses += 1
+
+    def as_dict(self) -> dict[str, int]:
+        return {'hits': self.hits, 'misses': self.misses}
+
+
+def is_shared(alias: str = DEFAULT_CACHE_ALIAS) -> bool:
+    """
+    Returns whether all server processes see the same entries of a cache.
+
+    Invalidating an entry of a process-local cache, like `LocMemCache`, only drops it in the
+    process handling the change, all other workers keep serving the stale entry. Caches whose
+    entries have to be invalidated are only used when this is true.
+    """
+
+    return not isinstance(caches[alias], LocMemCache)
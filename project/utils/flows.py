@@ -0,0 +1,152 @@
+from django.http import HttpRequest
+from django.shortcuts import redirect
+from asgiref.sync import iscoroutinefunction
+
+import functools
+import time
+
+
+# Session key holding every active flow as {name: expiry timestamp}
+SESSION_KEY = '_flows'
+
+
+class Flow:
+    """
+    One-shot state kept in the session between two steps of a flow.
+
+    Parameters
+    ----------
+    name : str
+        Unique name of the flow.
+    ttl : int
+        Seconds after which a started flow expires.
+
+    Notes
+    -----
+    - All flows share a single session key, so starting or consuming one is a single session write.
+    - The session is only modified when the state actually changes.
+    """
+
+    def __init__(self, name: str, ttl: int):
+        self.name = name
+        self.ttl = ttl
+
+    def __repr__(self) -> str:
+        return f'Flow({self.name!r}, ttl={self.ttl})'
+
+
+    def _started(self, state: dict | None) -> dict:
+        now = time.time()
+        state = {name: expires for name, expires in (state or {}).items() if expires > now}
+        state[self.name] = now + self.ttl
+        return state
+
+    def _consumed(self, state: dict | None) -> tuple[bool, dict]:
+        now = time.time()
+        state = {name: expires for name, expires in state.items() if expires > now}
+        return state.pop(self.name, None) is not None, state
+
+
+    def start(self, request: HttpRequest) -> None:
+        """Marks the flow as active for the next `ttl` seconds."""
+
+        request.session[SESSION_KEY] = self._started(request.session.get(SESSION_KEY))
+
+    def consume(self, request: HttpRequest) -> bool:
+        """
+        Reads and ends the flow in one step.
+
+        Returns
+        -------
+        bool
+            Whether the flow was active and not expired.
+        """
+
+        state = request.session.get(SESSION_KEY)
+        if not state or self.name not in state:
+            return False
+
+        active, state = self._consumed(state)
+        if state:
+            request.session[SESSION_KEY] = state
+        else:
+            del request.session[SESSION_KEY]
+        return active
+
+    def is_active(self, request: HttpRequest) -> bool:
+        """Checks the flow without ending it."""
+
+        state = request.session.get(SESSION_KEY) or {}
+        return state.get(self.name, 0) > time.time()
+
+
+    async def astart(self, request: HttpRequest) -> None:
+        """See start()."""
+
+        await request.session.aset(SESSION_KEY, self._started(await request.session.aget(SESSION_KEY)))
+
+    async def aconsume(self, request: HttpRequest) -> bool:
+        """See consume()."""
+
+        state = await request.session.aget(SESSION_KEY)
+        if not state or self.name not in state:
+            return False
+
+        active, state = self._consumed(state)
+        if state:
+            await request.session.aset(SESSION_KEY, state)
+        else:
+            await request.session.apop(SESSION_KEY)
+        return active
+
+
+def _active(state: dict | None) -> tuple[str, ...]:
+    now = time.time()
+    return tuple(sorted(name for name, expires in (state or {}).items() if expires > now))
+
+
+def active(request: HttpRequest) -> tuple[str, ...]:
+    """Returns the sorted names of the flows active in the session."""
+
+    return _active(request.session.get(SESSION_KEY))
+
+
+async def aactive(request: HttpRequest) -> tuple[str, ...]:
+    """See active()."""
+
+    return _active(await request.session.aget(SESSION_KEY))
+
+
+def flow_required(flow: Flow, redirect_to: str = ''):
+    """
+    Decorator to restrict view access to users in the middle of a flow.
+
+    Parameters
+    ----------
+    flow : Flow
+        The flow that has to be active, it's consumed by accessing the view.
+    redirect_to : str, optional
+        URL to redirect to if the flow isn't active (default is '').
+
+    Returns
+    -------
+    callable
+        A decorator function for the view.
+    """
+
+    def decorator(view_func):
+        if iscoroutinefunction(view_func):
+            @functools.wraps(view_func)
+            async def wrapper(request: HttpRequest, *args, **kwargs):
+                if await flow.aconsume(request):
+                    return await view_func(request, *args, **kwargs)
+                return redirect(redirect_to)
+        else:
+            @functools.wraps(view_func)
+            def wrapper(request: HttpRequest, *args, **kwargs):
+                if flow.consume(request):
+                    return view_func(request, *args, **kwargs)
+                return redirect(redirect_to)
+
+        return wrapper
+    return decorator
@@ -0,0 +1,17 @@
+from django.http import HttpRequest, HttpResponse
+from django.views.decorators.cache import never_cache
+
+from utils import warmup
+
+
+@never_cache
+def ready(request: HttpRequest) -> HttpResponse:
+    """
+    Readiness probe for load balancers.
+
+    Returns 200 once the warm-up finished and 503 before, without touching the session or database.
+    """
+
+    if warmup.READY.is_set():
+        return HttpResponse('ready', content_type='text/plain')
+    return HttpResponse('warming up', content_type='text/plain', status=503)
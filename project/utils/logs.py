@@ -0,0 +1,258 @@
+"""
+Structured logging that stays off the request thread.
+
+Records are put on a queue by `QueueHandler` and formatted as JSON lines by `JSONFormatter`
+in a `QueueListener` thread. `RequestIDMiddleware` binds a request ID to every record logged
+while handling a request, `bind()` does the same for work done on its behalf elsewhere, such
+as the mail worker delivering a message queued by the request. `SamplingFilter` keeps only a
+fraction of the low-level records of noisy loggers.
+"""
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.http import HttpRequest, HttpResponse
+
+import atexit
+import contextlib
+import contextvars
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import re
+import threading
+import uuid
+import weakref
+
+
+REQUEST_ID_HEADER = 'X-Request-ID'
+# Incoming request IDs are reused when they look sane, anything else is replaced
+REQUEST_ID_PATTERN = re.compile(r'^[A-Za-z0-9._-]{1,64}$')
+
+_request_id: contextvars.ContextVar[str] = contextvars.ContextVar('request_id', default='')
+
+# Every `QueueHandler` of the process, for `dropped()`
+_queue_handlers: 'weakref.WeakSet[QueueHandler]' = weakref.WeakSet()
+
+
+def get_request_id() -> str:
+    """Returns the ID of the request being handled, empty outside of requests."""
+
+    return _request_id.get()
+
+
+@contextlib.contextmanager
+def bind(request_id: str):
+    """Tags records logged in the block with `request_id`, e.g. in jobs started by a request."""
+
+    token = _request_id.set(request_id)
+    try:
+        yield
+    finally:
+        _request_id.reset(token)
+
+
+class RequestIDFilter(logging.Filter):
+    """
+    Sets `record.request_id`, it has to run on the logging thread to see the request.
+
+    Django logs 4xx and 5xx responses once `RequestIDMiddleware` has returned and unbound the ID,
+    their records carry the request instead, the ID is then read from there.
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        request_id = _request_id.get()
+        if not request_id:
+            request = getattr(record, 'request', None)
+            if isinstance(request, HttpRequest):
+                request_id = getattr(request, 'id', '')
+        record.request_id = request_id
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keeps a fraction of the records of noisy loggers.
+
+    Parameters
+    ----------
+    rates : dict of str to float
+        Share of records kept per logger name, applies to child loggers as well.
+    level : str, optional
+        Records of this level and above are always kept (default is 'WARNING').
+    """
+
+    def __init__(self, rates: dict[str, float], level: str = 'WARNING'):
+        super().__init__()
+        self.rates = rates
+        self.level = logging.getLevelName(level)
+        self._cache: dict[str, float] = {}
+
+    def rate(self, name: str) -> float:
+        rate = self._cache.get(name)
+        if rate is None:
+            rate = 1.0
+            parts = name.split('.')
+            # The most specific configured logger wins
+            for end in range(len(parts), 0, -1):
+                prefix = '.'.join(parts[:end])
+                if prefix in self.rates:
+                    rate = self.rates[prefix]
+                    break
+            self._cache[name] = rate
+        return rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= self.level:
+            return True
+        rate = self.rate(record.name)
+        return rate >= 1 or random.random() < rate
+
+
+class JSONFormatter(logging.Formatter):
+    """Formats records as single line JSON objects."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'request_id': getattr(record, 'request_id', ''),
+            'process': record.process,
+            'thread': record.threadName,
+        }
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exception'] = record.exc_text
+        if record.stack_info:
+            entry['stack'] = self.formatStack(record.stack_info)
+        return json.dumps(entry, default=str)
+
+    def formatTime(self, record: logging.LogRecord, datefmt: str = None) -> str:
+        return super().formatTime(record, '%Y-%m-%dT%H:%M:%S') + f'.{int(record.msecs):03d}'
+
+
+class QueueHandler(logging.handlers.QueueHandler):
+    """
+    Puts records on a queue drained by a `QueueListener` thread writing to `handlers`.
+
+    Parameters
+    ----------
+    handlers : list of logging.Handler
+        Handlers the listener writes to, e.g. 'cfg://handlers.console' in a `dictConfig`.
+    maxsize : int, optional
+        Queue capacity, records are dropped rather than blocking when it's full (default is 10000).
+
+    Notes
+    -----
+    - Only the message is interpolated on the logging thread, formatting happens in the listener.
+    - The listener is started lazily in every process, so it's safe to configure before a server forks.
+    """
+
+    def __init__(self, handlers: list[logging.Handler], maxsize: int = 10_000):
+        super().__init__(queue.Queue(maxsize))
+        # Indexing resolves the 'cfg://' references of a dictConfig, iterating doesn't. Handlers
+        # have to be configured before this one, the reference is their config otherwise.
+        self.handlers = [handlers[index] for index in range(len(handlers))]
+        for handler in self.handlers:
+            if not isinstance(handler, logging.Handler):
+                raise ValueError(f'{handler!r} is not a handler, configure it before the queue handler.')
+        self.dropped = 0
+        _queue_handlers.add(self)
+
+        self._lock = threading.Lock()
+        self._listener = None
+        self._pid = None
+
+
+    def _ensure_listener(self) -> None:
+        if self._pid == os.getpid():
+            return
+
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+
+            # The queue may hold records put before the fork, nobody else reads them
+            self.queue = queue.Queue(self.queue.maxsize)
+            self._listener = logging.handlers.QueueListener(self.queue, *self.handlers, respect_handler_level=True)
+            self._listener.start()
+            self._pid = os.getpid()
+            atexit.register(self.flush_listener)
+
+    def flush_listener(self) -> None:
+        """Stops the listener after it wrote all queued records."""
+
+        with self._lock:
+            if self._listener is not None and self._pid == os.getpid():
+                self._listener.stop()
+                self._listener = None
+                self._pid = None
+
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Freezes the message, arguments may change before the listener gets to them
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self._ensure_listener()
+        super().emit(record)
+
+
+def dropped() -> int:
+    """Returns the number of records dropped by every `QueueHandler` of the process, served on '/metrics'."""
+
+    return sum(handler.dropped for handler in list(_queue_handlers))
+
+
+class RequestIDMiddleware:
+    """
+    Binds a request ID to the request and its log records, returned in the `X-Request-ID` header.
+
+    An ID passed in by a proxy is reused, so log lines can be matched across services.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        request.id = self.get_request_id(request)
+        with bind(request.id):
+            response = self.get_response(request)
+        response[REQUEST_ID_HEADER] = request.id
+        return response
+
+    async def __acall__(self, request: HttpRequest) -> HttpResponse:
+        request.id = self.get_request_id(request)
+        with bind(request.id):
+            response = await self.get_response(request)
+        response[REQUEST_ID_HEADER] = request.id
+        return response
+
+
+    def get_request_id(self, request: HttpRequest) -> str:
+        request_id = request.headers.get(REQUEST_ID_HEADER, '')
+        if REQUEST_ID_PATTERN.match(request_id):
+            return request_id
+        return uuid.uuid4().hex
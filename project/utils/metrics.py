@@ -0,0 +1,335 @@
+"""
+Per-view request metrics, enabled by `utils.metrics.MetricsMiddleware`.
+
+Every request measures its total time, database time and query count, template render
+time, password hashing time and time spent queueing emails. They are sent back in a
+`Server-Timing` header and aggregated per URL name into histograms served in the
+Prometheus text format by `view` on '/metrics', to clients from `METRICS_ALLOWED_NETWORKS`
+or carrying `METRICS_TOKEN`.
+
+Hit and miss counters of the caches in `utils.caches.STATS` are served there as well, along
+with the values exported through `register`, e.g. the password hashing queue and records
+dropped by `utils.logs.QueueHandler`.
+
+Template render time is only measured with the `utils.metrics.DjangoTemplates` backend.
+"""
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import Http404, HttpRequest, HttpResponse
+from django.template.backends import django as django_backend
+from django.views.decorators.cache import never_cache
+
+from utils import caches, logs
+
+from typing import Callable
+
+import bisect
+import contextlib
+import contextvars
+import hmac
+import ipaddress
+import threading
+import time
+
+
+COMPONENTS = ['db', 'template', 'hash', 'email']
+
+# Upper bounds of histogram buckets, in seconds and in queries
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55)
+
+
+class Timings:
+    """Time spent in every component during one request."""
+
+    def __init__(self):
+        self.seconds = dict.fromkeys(COMPONENTS, 0.0)
+        self.queries = 0
+
+    def add(self, component: str, seconds: float) -> None:
+        self.seconds[component] += seconds
+
+
+_timings: contextvars.ContextVar[Timings | None] = contextvars.ContextVar('request_timings', default=None)
+
+
+@contextlib.contextmanager
+def timed(component: str):
+    """
+    Adds the time spent in the block to `component` of the current request.
+
+    Does nothing outside of requests, e.g. in management commands.
+    """
+
+    timings = _timings.get()
+    if timings is None:
+        yield
+        return
+
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(component, time.perf_counter() - started)
+
+
+def time_queries(execute, sql, params, many, context):
+    timings = _timings.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.add('db', time.perf_counter() - started)
+        timings.queries += 1
+
+
+def install_query_timer(connection, **kwargs):
+    if time_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(time_queries)
+
+
+class Template(django_backend.Template):
+    def render(self, context=None, request=None):
+        with timed('template'):
+            return super().render(context, request)
+
+
+class DjangoTemplates(django_backend.DjangoTemplates):
+    """`django.template.backends.django.DjangoTemplates` measuring render time of its templates."""
+
+    def from_string(self, template_code):
+        return Template(super().from_string(template_code).template, self)
+
+    def get_template(self, template_name):
+        return Template(super().get_template(template_name).template, self)
+
+
+class Histogram:
+    def __init__(self, buckets: tuple):
+        self.buckets = buckets
+        # One more for observations above the last bound
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+
+def merge(into: dict, shard: dict) -> None:
+    """Adds the histograms of `shard` to those in `into`."""
+
+    # Copy first, the owning thread may add histograms meanwhile
+    for key, histogram in list(shard.items()):
+        total = into.get(key)
+        if total is None:
+            total = into[key] = Histogram(histogram.buckets)
+        total.counts = [a + b for a, b in zip(total.counts, histogram.counts)]
+        total.sum += histogram.sum
+
+
+class Registry:
+    """
+    Histograms of every metric by URL name.
+
+    Notes
+    -----
+    - Every thread observes into its own shard, so recording never takes a lock. Only the first
+      observation of a thread and collecting take the lock, collecting merges all shards.
+    - Shards of finished threads are merged into one, so servers starting a thread per request
+      don't pile up shards.
+    - Metrics are per process, with several server workers every one of them reports its own.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._shards: dict[threading.Thread, dict] = {}
+        self._retired = {}
+
+    def _shard(self) -> dict:
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._local.shard = {}
+            with self._lock:
+                self._retire_finished()
+                self._shards[threading.current_thread()] = shard
+        return shard
+
+    def _retire_finished(self) -> None:
+        # Called with the lock held, finished threads no longer write to their shards
+        for thread in [thread for thread in self._shards if not thread.is_alive()]:
+            merge(self._retired, self._shards.pop(thread))
+
+    def observe(self, metric: str, view: str, value: float, buckets: tuple = DURATION_BUCKETS) -> None:
+        shard = self._shard()
+        histogram = shard.get((metric, view))
+        if histogram is None:
+            histogram = shard[(metric, view)] = Histogram(buckets)
+        histogram.observe(value)
+
+    def collect(self) -> dict[tuple[str, str], Histogram]:
+        """Returns histograms of all shards merged by metric and URL name."""
+
+        merged = {}
+        with self._lock:
+            self._retire_finished()
+            merge(merged, self._retired)
+            for shard in self._shards.values():
+                merge(merged, shard)
+        return merged
+
+
+registry = Registry()
+
+
+def record(view: str, total: float, timings: Timings) -> None:
+    registry.observe('http_request_duration_seconds', view, total)
+    registry.observe('http_request_queries', view, timings.queries, QUERY_BUCKETS)
+    for component, seconds in timings.seconds.items():
+        registry.observe(f'http_request_{component}_duration_seconds', view, seconds)
+
+
+def server_timing(total: float, timings: Timings) -> str:
+    entries = [f'total;dur={total * 1000:.1f}']
+    for component, seconds in timings.seconds.items():
+        if component == 'db':
+            entries.append(f'db;dur={seconds * 1000:.1f};desc="{timings.queries} queries"')
+        elif seconds:
+            entries.append(f'{component};dur={seconds * 1000:.1f}')
+    return ', '.join(entries)
+
+
+class MetricsMiddleware:
+    """
+    Measures requests, should come first in `MIDDLEWARE` so the total covers all other middleware.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+        connection_created.connect(install_query_timer, dispatch_uid='utils.metrics')
+        for connection in connections.all(initialized_only=True):
+            install_query_timer(connection)
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        timings = Timings()
+        token = _timings.set(timings)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _timings.reset(token)
+        return self.process_response(request, response, time.perf_counter() - started, timings)
+
+    async def __acall__(self, request: HttpRequest) -> HttpResponse:
+        timings = Timings()
+        token = _timings.set(timings)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _timings.reset(token)
+        return self.process_response(request, response, time.perf_counter() - started, timings)
+
+
+    def process_response(self, request: HttpRequest, response: HttpResponse, total: float, timings: Timings) -> HttpResponse:
+        match = request.resolver_match
+        record(match.view_name if match else 'unresolved', total, timings)
+        response['Server-Timing'] = server_timing(total, timings)
+        return response
+
+
+# Values read on every scrape, see register()
+_values: dict[str, tuple[str, Callable[[], float | None]]] = {}
+
+
+def register(metric: str, kind: str, read: Callable[[], float | None]) -> None:
+    """
+    Exports a value read on every scrape.
+
+    Parameters
+    ----------
+    metric : str
+        Name of the metric.
+    kind : str
+        Prometheus type of the metric, 'gauge' or 'counter'.
+    read : callable
+        Returns the current value, or None to leave the metric out.
+    """
+
+    _values[metric] = (kind, read)
+
+
+register('log_records_dropped_total', 'counter', logs.dropped)
+
+
+def render() -> str:
+    """Renders all histograms, cache counters and registered values in the Prometheus text exposition format."""
+
+    lines = []
+    histograms = registry.collect()
+    for metric in sorted({metric for metric, _ in histograms}):
+        lines.append(f'# TYPE {metric} histogram')
+        for (name, view), histogram in sorted(histograms.items()):
+            if name != metric:
+                continue
+
+            cumulative = 0
+            for bound, count in zip(histogram.buckets + ('+Inf',), histogram.counts):
+                cumulative += count
+                lines.append(f'{metric}_bucket{{view="{view}",le="{bound}"}} {cumulative}')
+            lines.append(f'{metric}_sum{{view="{view}"}} {histogram.sum}')
+            lines.append(f'{metric}_count{{view="{view}"}} {cumulative}')
+
+    for counter in ('hits', 'misses'):
+        lines.append(f'# TYPE cache_{counter}_total counter')
+        for name, stats in sorted(caches.STATS.items()):
+            lines.append(f'cache_{counter}_total{{cache="{name}"}} {stats.as_dict()[counter]}')
+
+    for metric, (kind, read) in sorted(_values.items()):
+        value = read()
+        if value is not None:
+            lines.append(f'# TYPE {metric} {kind}')
+            lines.append(f'{metric} {value}')
+    return '\n'.join(lines) + '\n'
+
+
+def is_allowed(request: HttpRequest) -> bool:
+    """Returns whether `request` comes from `METRICS_ALLOWED_NETWORKS` or carries `METRICS_TOKEN`."""
+
+    if settings.METRICS_TOKEN:
+        token = request.headers.get('Authorization', '').removeprefix('Bearer ')
+        if hmac.compare_digest(token.encode(), settings.METRICS_TOKEN.encode()):
+            return True
+
+    try:
+        address = ipaddress.ip_address(request.META.get('REMOTE_ADDR', ''))
+    except ValueError:
+        return False
+    return any(address in ipaddress.ip_network(network) for network in settings.METRICS_ALLOWED_NETWORKS)
+
+
+@never_cache
+def view(request: HttpRequest) -> HttpResponse:
+    """
+    Prometheus scrape endpoint, answers 404 to clients that aren't allowed by `is_allowed`.
+    """
+
+    if not is_allowed(request):
+        raise Http404
+    return HttpResponse(render(), content_type='text/plain; version=0.0.4; charset=utf-8')
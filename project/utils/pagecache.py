@@ -0,0 +1,149 @@
+"""
+Full-page cache for form pages that look the same to every anonymous visitor.
+
+Views decorated with `anonymous_page_cache` render their page once per release. The stored
+page has its CSRF tokens replaced by a placeholder and each cache hit fills in the token of
+the requesting client, so serving it skips form construction, template rendering and the
+session store.
+
+Only visitors without a server-side session are served from the cache, sessions of the
+hybrid engine kept in a cookie can't hold a logged in user, see `utils.sessions`. Pages
+are cached separately per combination of active flows, see `utils.flows`, and the cache
+is invalidated on every deploy by keying it with `PAGE_CACHE_VERSION`.
+"""
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.core.cache import cache
+from django.http import HttpRequest, HttpResponse
+from django.middleware.csrf import get_token
+from django.utils.cache import patch_vary_headers
+
+from utils import flows
+from utils.caches import CacheStats
+
+import functools
+import re
+import uuid
+
+
+# Stands in for the CSRF token of `{% csrf_token %}` in stored pages
+CSRF_PLACEHOLDER = b'__csrf_token__'
+CSRF_INPUT_PATTERN = re.compile(rb'(name="csrfmiddlewaretoken" value=")[^"]*(")')
+
+# Headers of the rendered response kept with the page, such as the preload links of `template_view`
+STORED_HEADERS = ('Content-Type', 'Link')
+
+stats = CacheStats('pages')
+
+
+@functools.cache
+def version() -> str:
+    # Without a release identifier every process start counts as a deploy
+    return settings.PAGE_CACHE_VERSION or uuid.uuid4().hex
+
+
+def is_cacheable_request(request: HttpRequest) -> bool:
+    """
+    Checks that the request is an anonymous GET, without loading the session.
+
+    Requests carrying messages are left to the view, they're only shown once.
+    """
+
+    return (
+        request.method == 'GET'
+        and getattr(request.session, 'in_cookie', False)
+        and CookieStorage.cookie_name not in request.COOKIES
+    )
+
+
+def cache_key(request: HttpRequest, flow_names: tuple[str, ...]) -> str:
+    return f'pagecache:{version()}:{request.path}:{",".join(flow_names)}'
+
+
+def is_cacheable_response(request: HttpRequest, response: HttpResponse) -> bool:
+    # Pages setting cookies or changing the session depend on the visitor
+    return (
+        response.status_code == 200
+        and not response.streaming
+        and not response.cookies
+        and not request.session.modified
+    )
+
+
+def to_entry(response: HttpResponse) -> tuple[bytes, dict[str, str]]:
+    content = CSRF_INPUT_PATTERN.sub(rb'\1' + CSRF_PLACEHOLDER + rb'\2', response.content)
+    headers = {header: response[header] for header in STORED_HEADERS if header in response}
+    return content, headers
+
+
+def from_entry(request: HttpRequest, entry: tuple[bytes, dict[str, str]]) -> HttpResponse:
+    content, headers = entry
+    # Also makes CsrfViewMiddleware set the CSRF cookie when the client has none
+    content = content.replace(CSRF_PLACEHOLDER, get_token(request).encode())
+    response = HttpResponse(content, headers=headers)
+    patch_vary_headers(response, ('Cookie',))
+    return response
+
+
+def anonymous_page_cache(timeout: int = None):
+    """
+    Decorator caching the page a view renders for anonymous GET requests.
+
+    Parameters
+    ----------
+    timeout : int, optional
+        Seconds a page stays cached. If not provided, `PAGE_CACHE_TIMEOUT` is used (default is None).
+
+    Returns
+    -------
+    callable
+        A decorator function for the view.
+
+    Notes
+    -----
+    - Only for views whose GET page doesn't depend on the query string or the session,
+      other than through `user` and active flows.
+    - Works with both sync and async views.
+    - Hits and misses are counted in `stats`.
+    """
+
+    def decorator(view_func):
+        if iscoroutinefunction(view_func):
+            @functools.wraps(view_func)
+            async def wrapper(request: HttpRequest, *args, **kwargs):
+                if not is_cacheable_request(request):
+                    return await view_func(request, *args, **kwargs)
+
+                key = cache_key(request, await flows.aactive(request) if request.session.session_key else ())
+                entry = await cache.aget(key)
+                if entry is not None:
+                    stats.hit()
+                    return from_entry(request, entry)
+
+                stats.miss()
+                response = await view_func(request, *args, **kwargs)
+                if is_cacheable_response(request, response):
+                    await cache.aset(key, to_entry(response), timeout or settings.PAGE_CACHE_TIMEOUT)
+                return response
+        else:
+            @functools.wraps(view_func)
+            def wrapper(request: HttpRequest, *args, **kwargs):
+                if not is_cacheable_request(request):
+                    return view_func(request, *args, **kwargs)
+
+                key = cache_key(request, flows.active(request) if request.session.session_key else ())
+                entry = cache.get(key)
+                if entry is not None:
+                    stats.hit()
+                    return from_entry(request, entry)
+
+                stats.miss()
+                response = view_func(request, *args, **kwargs)
+                if is_cacheable_response(request, response):
+                    cache.set(key, to_entry(response), timeout or settings.PAGE_CACHE_TIMEOUT)
+                return response
+
+        return wrapper
+    return decorator
@@ -0,0 +1,263 @@
+"""
+On-demand profiling of live requests, enabled by `utils.profiling.ProfilingMiddleware`.
+
+A `PROFILING_SAMPLE_RATE` fraction of requests is profiled, as is every request carrying
+a token from `manage.py profile_token` in the `PROFILING_HEADER` header. Profiles are
+written per URL name to `PROFILING_DIR`, the oldest are removed once the directory grows
+over `PROFILING_MAX_BYTES`. `manage.py merge_profiles` merges them per URL name.
+
+With `PROFILING_MODE = 'cprofile'` profiles are pstats files, with 'sample' a wall-clock
+stack sampler writes collapsed stacks, ready for flamegraph tools.
+"""
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from collections import Counter
+from django.conf import settings
+from django.core import signing
+from django.http import HttpRequest, HttpResponse
+
+import contextlib
+import cProfile
+import logging
+import os
+import random
+import sys
+import threading
+import time
+
+
+logger = logging.getLogger(__name__)
+
+TOKEN_SALT = 'utils.profiling'
+# Separates the URL name from the rest of a profile file name
+VIEW_SEPARATOR = '@'
+EXTENSIONS = {'cprofile': '.prof', 'sample': '.folded'}
+
+
+def make_token() -> str:
+    """Returns a token profiling every request carrying it for `PROFILING_TOKEN_MAX_AGE` seconds."""
+
+    return signing.TimestampSigner(salt=TOKEN_SALT).sign('profile')
+
+
+def is_valid_token(token: str) -> bool:
+    try:
+        signing.TimestampSigner(salt=TOKEN_SALT).unsign(token, max_age=settings.PROFILING_TOKEN_MAX_AGE)
+    except signing.BadSignature:
+        return False
+    return True
+
+
+def collapse(frame) -> str:
+    """Returns the stack ending in `frame` in the collapsed format, outermost call first."""
+
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f'{code.co_name} ({code.co_filename}:{code.co_firstlineno})')
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+class Sampler:
+    """
+    Samples stacks of registered threads from a background thread.
+
+    The background thread only runs while at least one thread is registered.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stacks: dict[int, Counter] = {}
+        self._thread = None
+
+    def start(self, thread_id: int) -> None:
+        with self._lock:
+            self._stacks[thread_id] = Counter()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='profiling-sampler', daemon=True)
+                self._thread.start()
+
+    def stop(self, thread_id: int) -> Counter:
+        with self._lock:
+            return self._stacks.pop(thread_id)
+
+    def _run(self) -> None:
+        while True:
+            # Counted under the lock, so a counter returned by `stop` is never written to again
+            with self._lock:
+                if not self._stacks:
+                    self._thread = None
+                    return
+
+                frames = sys._current_frames()
+                for thread_id, counter in self._stacks.items():
+                    frame = frames.get(thread_id)
+                    if frame is not None:
+                        counter[collapse(frame)] += 1
+            time.sleep(settings.PROFILING_SAMPLE_INTERVAL)
+
+
+sampler = Sampler()
+
+# Held while a request is profiled with cProfile, which can only profile one thread of a process
+# at a time. Since Python 3.12 enabling a second profile raises.
+cprofile_lock = threading.Lock()
+
+
+def enforce_size_cap(directory: str, max_bytes: int) -> None:
+    """Removes the oldest profiles until `directory` fits into `max_bytes`."""
+
+    entries = []
+    for entry in os.scandir(directory):
+        if entry.is_file() and entry.name.endswith(tuple(EXTENSIONS.values())):
+            stat = entry.stat()
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            # Removed by another worker
+            pass
+        total -= size
+
+
+class ProfilingMiddleware:
+    """
+    Profiles sampled and explicitly requested requests.
+
+    Notes
+    -----
+    - Requests that aren't profiled cost a dictionary lookup, and a random number with sampling on.
+    - Profilers only see the thread handling the request. Under ASGI that's the event loop, so code
+      run in sync_to_async threads is missed and other requests' coroutines may show up.
+    - At most one request per thread is profiled at a time, and with cProfile one per process.
+      Overlapping requests are skipped.
+    - Profiles that can't be written are logged and dropped, the response is still returned.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+        self.header = 'HTTP_' + settings.PROFILING_HEADER.upper().replace('-', '_')
+        self.sample_rate = settings.PROFILING_SAMPLE_RATE
+        self.mode = settings.PROFILING_MODE
+        self._local = threading.local()
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        if not self.should_profile(request):
+            return self.get_response(request)
+
+        try:
+            profile = self.start()
+        except Exception:
+            # E.g. another profiler, like a coverage tool, is active since Python 3.12
+            logger.exception('Could not start profiling %s', request.path)
+            self.release()
+            return self.get_response(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            self.finish(request, profile)
+        return response
+
+    async def __acall__(self, request: HttpRequest) -> HttpResponse:
+        if not self.should_profile(request):
+            return await self.get_response(request)
+
+        try:
+            profile = self.start()
+        except Exception:
+            # E.g. another profiler, like a coverage tool, is active since Python 3.12
+            logger.exception('Could not start profiling %s', request.path)
+            self.release()
+            return await self.get_response(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            self.finish(request, profile)
+        return response
+
+
+    def should_profile(self, request: HttpRequest) -> bool:
+        token = request.META.get(self.header)
+        if token is not None:
+            wanted = is_valid_token(token)
+        else:
+            wanted = bool(self.sample_rate) and random.random() < self.sample_rate
+        return wanted and self.acquire()
+
+    def acquire(self) -> bool:
+        """Reserves profiling for the current request, False when another one holds it."""
+
+        if getattr(self._local, 'active', False):
+            return False
+        if self.mode == 'cprofile' and not cprofile_lock.acquire(blocking=False):
+            return False
+        self._local.active = True
+        return True
+
+    def release(self) -> None:
+        self._local.active = False
+        if self.mode == 'cprofile':
+            cprofile_lock.release()
+
+    def start(self) -> cProfile.Profile | None:
+        if self.mode == 'sample':
+            sampler.start(threading.get_ident())
+            return None
+
+        profile = cProfile.Profile()
+        profile.enable()
+        return profile
+
+    def finish(self, request: HttpRequest, profile: cProfile.Profile | None) -> None:
+        stacks = None
+        try:
+            if profile is not None:
+                profile.disable()
+            else:
+                stacks = sampler.stop(threading.get_ident())
+        finally:
+            self.release()
+
+        try:
+            self.write(request, profile, stacks)
+        except Exception:
+            logger.exception('Could not write the profile of %s', request.path)
+
+    def write(self, request: HttpRequest, profile: cProfile.Profile | None, stacks: Counter | None) -> None:
+        match = request.resolver_match
+        # Colons aren't allowed in file names everywhere
+        view = match.view_name.replace(':', '.') if match else 'unresolved'
+        directory = str(settings.PROFILING_DIR)
+        os.makedirs(directory, exist_ok=True)
+
+        name = f'{view}{VIEW_SEPARATOR}{time.time_ns()}-{os.getpid()}-{threading.get_ident()}{EXTENSIONS[self.mode]}'
+        path = os.path.join(directory, name)
+        # Written under a temporary name so merging never reads partial files
+        try:
+            if profile is not None:
+                profile.dump_stats(path + '.tmp')
+            else:
+                with open(path + '.tmp', 'w') as file:
+                    file.writelines(f'{stack} {count}\n' for stack, count in stacks.items())
+            os.replace(path + '.tmp', path)
+        except BaseException:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(path + '.tmp')
+            raise
+
+        enforce_size_cap(directory, settings.PROFILING_MAX_BYTES)
@@ -0,0 +1,151 @@
+"""
+Read/write splitting between the primary database and its read replicas.
+
+Reads of models from `REPLICA_APPS` go to one alias from `DATABASE_REPLICAS`, picked at
+random once per request so its reads see a single consistent snapshot. Everything else and
+all writes go to 'default'. After a write, reads stay on the primary for `REPLICA_PIN_SECONDS`,
+carried between requests of the same client in a cookie by `ReplicaPinningMiddleware`, so
+users always see their own writes.
+
+Reads that decide what to write, like uniqueness checks of form validation, have to see the
+latest data. Requests with unsafe methods read from the primary throughout, other code wraps
+such reads in `primary()`.
+"""
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import HttpRequest, HttpResponse
+
+import contextlib
+import contextvars
+import random
+import time
+
+
+PIN_COOKIE = 'primary_pin'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+
+
+class PinState:
+    def __init__(self, until: float = 0, primary: bool = False):
+        self.until = until
+        self.wrote = False
+        # Reads go to the primary regardless of the pin
+        self.primary = primary
+        self.replica = None
+
+    def pin(self) -> None:
+        self.until = time.time() + settings.REPLICA_PIN_SECONDS
+        self.wrote = True
+
+    def is_pinned(self) -> bool:
+        return self.primary or self.until > time.time()
+
+    def get_replica(self) -> str:
+        if self.replica is None:
+            self.replica = random.choice(settings.DATABASE_REPLICAS)
+        return self.replica
+
+
+_state: contextvars.ContextVar[PinState | None] = contextvars.ContextVar('replica_pin_state', default=None)
+
+
+def get_state() -> PinState:
+    state = _state.get()
+    if state is None:
+        # Outside of requests, e.g. in management commands
+        state = PinState()
+        _state.set(state)
+    return state
+
+
+@contextlib.contextmanager
+def primary():
+    """Sends reads inside the block to the primary, for reads that decide what to write."""
+
+    state = get_state()
+    previous, state.primary = state.primary, True
+    try:
+        yield
+    finally:
+        state.primary = previous
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label not in settings.REPLICA_APPS or not settings.DATABASE_REPLICAS:
+            return None
+        if get_state().is_pinned():
+            return 'default'
+        return get_state().get_replica()
+
+    def db_for_write(self, model, **hints):
+        if model._meta.app_label in settings.REPLICA_APPS:
+            get_state().pin()
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {'default', *settings.DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas are copies of the primary
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
+
+
+class ReplicaPinningMiddleware:
+    """
+    Keeps reads of a client on the primary for a short time after it wrote something.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        state = self.get_request_state(request)
+        token = _state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.reset(token)
+        return self.process_response(state, response)
+
+    async def __acall__(self, request: HttpRequest) -> HttpResponse:
+        state = self.get_request_state(request)
+        token = _state.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _state.reset(token)
+        return self.process_response(state, response)
+
+
+    def get_request_state(self, request: HttpRequest) -> PinState:
+        primary = request.method not in SAFE_METHODS
+        try:
+            return PinState(float(request.COOKIES.get(PIN_COOKIE, 0)), primary)
+        except ValueError:
+            return PinState(primary=primary)
+
+    def process_response(self, state: PinState, response: HttpResponse) -> HttpResponse:
+        if state.wrote:
+            response.set_cookie(
+                PIN_COOKIE,
+                f'{state.until:.3f}',
+                max_age=settings.REPLICA_PIN_SECONDS,
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
@@ -0,0 +1,66 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpRequest
+
+from utils import caches
+
+
+stats = caches.CacheStats('roles')
+
+
+def cache_key(user_pk) -> str:
+    return f'roles:{user_pk}'
+
+
+def get_roles(request: HttpRequest) -> frozenset[str]:
+    """
+    Returns names of the groups the requesting user belongs to.
+
+    Parameters
+    ----------
+    request : HttpRequest
+        The current request.
+
+    Returns
+    -------
+    frozenset of str
+        Role names, empty for anonymous users and users without groups.
+
+    Notes
+    -----
+    - Roles are stored on the request and, when the cache backend is shared by all processes,
+      in the cache for `ROLES_CACHE_TIMEOUT` seconds. A process-local cache couldn't be invalidated
+      from other processes, roles are then read once per request.
+    - Cached roles are invalidated when group memberships change or a group is renamed or deleted.
+    """
+
+    roles = getattr(request, '_roles', None)
+    if roles is not None:
+        return roles
+
+    user = request.user
+    if not user.is_authenticated:
+        return frozenset()
+
+    if not caches.is_shared():
+        request._roles = frozenset(user.groups.values_list('name', flat=True))
+        return request._roles
+
+    key = cache_key(user.pk)
+    roles = cache.get(key)
+    if roles is None:
+        stats.miss()
+        roles = frozenset(user.groups.values_list('name', flat=True))
+        cache.set(key, roles, settings.ROLES_CACHE_TIMEOUT)
+    else:
+        stats.hit()
+
+    request._roles = roles
+    return roles
+
+
+def invalidate(*user_pks) -> None:
+    """Drops cached roles of the given users."""
+
+    if user_pks:
+        cache.delete_many([cache_key(pk) for pk in user_pks])
@@ -0,0 +1,154 @@
+"""
+Hybrid session engine, enabled with `SESSION_ENGINE = 'utils.sessions'`.
+
+Sessions holding only keys listed in `HYBRID_SESSION_COOKIE_KEYS` and fitting into
+`HYBRID_SESSION_COOKIE_MAX_SIZE` are kept in a signed cookie and never touch the server.
+Once a session holds anything else, such as a logged in user, it's promoted under a fresh
+key to the cache with the database as fallback, like `django.contrib.sessions.backends.cached_db`.
+
+The cache is skipped when `SESSION_CACHE_ALIAS` is local to each process: a session ended in
+one worker would stay valid in the caches of all others. Server-side sessions then only live
+in the database, like `django.contrib.sessions.backends.db`.
+"""
+
+from django.conf import settings
+from django.contrib.sessions.backends.cached_db import SessionStore as CachedDBStore
+from django.contrib.sessions.backends.db import SessionStore as DBStore
+from django.core import signing
+
+from utils import caches
+
+
+# Marks session keys carrying the signed data itself, server-side keys are plain alphanumerics
+COOKIE_PREFIX = 'c.'
+COOKIE_SALT = 'utils.sessions'
+
+
+class SessionStore(CachedDBStore):
+    def __init__(self, session_key=None):
+        super().__init__(session_key)
+        self.in_cookie = not session_key or session_key.startswith(COOKIE_PREFIX)
+        # Store whose methods load and save server-side sessions
+        self.server = CachedDBStore if caches.is_shared(settings.SESSION_CACHE_ALIAS) else DBStore
+
+
+    def _to_cookie(self, data: dict) -> str | None:
+        """Returns the cookie session key for `data`, or None when it has to be stored server-side."""
+
+        if not set(data).issubset(settings.HYBRID_SESSION_COOKIE_KEYS):
+            return None
+
+        payload = signing.dumps(data, salt=COOKIE_SALT, serializer=self.serializer, compress=True)
+        if len(payload) > settings.HYBRID_SESSION_COOKIE_MAX_SIZE:
+            return None
+        return COOKIE_PREFIX + payload
+
+    def _is_cookie_key(self, session_key: str | None) -> bool:
+        if session_key is None:
+            return self.in_cookie
+        return session_key.startswith(COOKIE_PREFIX)
+
+
+    def load(self):
+        if not self.in_cookie:
+            return self.server.load(self)
+
+        try:
+            return signing.loads(
+                self.session_key[len(COOKIE_PREFIX):],
+                salt=COOKIE_SALT,
+                serializer=self.serializer,
+                max_age=self.get_session_cookie_age(),
+            )
+        except Exception:
+            # Tampered or expired cookie, start over with an empty session
+            self._session_key = None
+            return {}
+
+    def save(self, must_create=False):
+        if not self.in_cookie:
+            return self.server.save(self, must_create)
+
+        session_key = self._to_cookie(self._get_session(no_load=must_create))
+        if session_key:
+            self._session_key = session_key
+            self.modified = True
+            return
+
+        # Promote to server-side storage under a fresh key
+        self.in_cookie = False
+        self._session_key = None
+        self.create()
+
+    def create(self):
+        if self.in_cookie:
+            self.modified = True
+            return
+        super().create()
+
+    def exists(self, session_key):
+        if self._is_cookie_key(session_key):
+            return False
+        return self.server.exists(self, session_key)
+
+    def delete(self, session_key=None):
+        if self._is_cookie_key(session_key):
+            return
+        self.server.delete(self, session_key)
+
+    def cycle_key(self):
+        if self.in_cookie:
+            # A new signature is a new key
+            self.save()
+            return
+        super().cycle_key()
+
+    def flush(self):
+        super().flush()
+        self.in_cookie = True
+
+
+    async def aload(self):
+        if self.in_cookie:
+            return self.load()
+        return await self.server.aload(self)
+
+    async def asave(self, must_create=False):
+        if not self.in_cookie:
+            return await self.server.asave(self, must_create)
+
+        session_key = self._to_cookie(await self._aget_session(no_load=must_create))
+        if session_key:
+            self._session_key = session_key
+            self.modified = True
+            return
+
+        self.in_cookie = False
+        self._session_key = None
+        await self.acreate()
+
+    async def acreate(self):
+        if self.in_cookie:
+            self.modified = True
+            return
+        await super().acreate()
+
+    async def aexists(self, session_key):
+        if self._is_cookie_key(session_key):
+            return False
+        return await self.server.aexists(self, session_key)
+
+    async def adelete(self, session_key=None):
+        if self._is_cookie_key(session_key):
+            return
+        await self.server.adelete(self, session_key)
+
+    async def acycle_key(self):
+        if self.in_cookie:
+            await self.asave()
+            return
+        await super().acycle_key()
+
+    async def aflush(self):
+        await super().aflush()
+        self.in_cookie = True
@@ -0,0 +1,112 @@
+"""
+SQLite backend serializing writes within the process, enabled with `'ENGINE': 'utils.sqlite'`.
+
+SQLite allows a single writer at a time. Writers that don't get the lock within
+`busy_timeout` fail with "database is locked". This backend makes writing threads
+wait on a process-wide lock per database file instead, so concurrent writes queue
+up in order. Write transactions hold the lock from `BEGIN` until commit or rollback,
+single writes outside of transactions hold it for the statement only.
+"""
+
+from django.db import OperationalError
+from django.db.backends.sqlite3 import base
+from django.utils.regex_helper import _lazy_re_compile
+
+import re
+import threading
+
+
+WRITE_QUERY_REGEX = _lazy_re_compile(r'^\s*(INSERT|UPDATE|DELETE|REPLACE|CREATE|DROP|ALTER)\b', re.IGNORECASE)
+
+_write_locks: dict[str, threading.Lock] = {}
+_write_locks_guard = threading.Lock()
+
+
+def get_write_lock(name: str) -> threading.Lock:
+    with _write_locks_guard:
+        return _write_locks.setdefault(name, threading.Lock())
+
+
+class SerializedCursorWrapper(base.SQLiteCursorWrapper):
+    database = None
+
+    def _needs_lock(self, query: str) -> bool:
+        # Inside transactions the lock is already held since 'BEGIN'
+        return not self.connection.in_transaction and WRITE_QUERY_REGEX.match(query) is not None
+
+    def execute(self, query, params=None):
+        if not self._needs_lock(query):
+            return super().execute(query, params)
+        with self.database.write_lock_held():
+            return super().execute(query, params)
+
+    def executemany(self, query, param_list):
+        if not self._needs_lock(query):
+            return super().executemany(query, param_list)
+        with self.database.write_lock_held():
+            return super().executemany(query, param_list)
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.write_lock = get_write_lock(str(self.settings_dict['NAME']))
+        self.write_lock_timeout = self.settings_dict['OPTIONS'].get('timeout', 5)
+        self.holds_write_lock = False
+
+
+    def acquire_write_lock(self) -> None:
+        if not self.write_lock.acquire(timeout=self.write_lock_timeout):
+            raise OperationalError('database is locked (timed out waiting for the write lock)')
+        self.holds_write_lock = True
+
+    def release_write_lock(self) -> None:
+        if self.holds_write_lock:
+            self.holds_write_lock = False
+            self.write_lock.release()
+
+    def write_lock_held(self):
+        return _WriteLock(self)
+
+
+    def create_cursor(self, name=None):
+        cursor = self.connection.cursor(factory=SerializedCursorWrapper)
+        cursor.database = self
+        return cursor
+
+    def _start_transaction_under_autocommit(self):
+        self.acquire_write_lock()
+        try:
+            super()._start_transaction_under_autocommit()
+        except BaseException:
+            self.release_write_lock()
+            raise
+
+    def _commit(self):
+        try:
+            return super()._commit()
+        finally:
+            self.release_write_lock()
+
+    def _rollback(self):
+        try:
+            return super()._rollback()
+        finally:
+            self.release_write_lock()
+
+    def _close(self):
+        try:
+            return super()._close()
+        finally:
+            self.release_write_lock()
+
+
+class _WriteLock:
+    def __init__(self, database: DatabaseWrapper):
+        self.database = database
+
+    def __enter__(self):
+        self.database.acquire_write_lock()
+
+    def __exit__(self, *exc_info):
+        self.database.release_write_lock()
@@ -0,0 +1,221 @@
+"""
+Fingerprinted, precompressed static files.
+
+`CompressedManifestStaticFilesStorage` adds a content hash to every collected file name
+and writes a `.gz` variant next to compressible ones. `StaticFilesMiddleware` serves them
+from `STATIC_ROOT` with far-future immutable caching when `STATIC_SERVE` is on, for
+deployments without a front proxy serving '/static/'.
+"""
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage, staticfiles_storage
+from django.core import checks
+from django.core.exceptions import MiddlewareNotUsed, SuspiciousFileOperation
+from django.http import FileResponse, HttpRequest, HttpResponse, HttpResponseNotModified
+from django.template import engines
+from django.utils._os import safe_join
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+import gzip
+import logging
+import mimetypes
+import os
+import re
+import shutil
+
+
+logger = logging.getLogger(__name__)
+
+COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.svg', '.html', '.txt', '.json', '.xml', '.map')
+# Smaller files barely shrink, not worth a second file and request branch
+MIN_COMPRESS_SIZE = 256
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+MUTABLE_CACHE_CONTROL = 'public, max-age=60'
+
+STATIC_TAG_PATTERN = re.compile(r'''{%\s*(?:static|stylesheet)\s+(['"])(?P<path>[^'"]+)\1''')
+GZIP_PATTERN = re.compile(r'\bgzip\b(?!\s*;\s*q=0(\.0*)?\b)')
+
+
+def compress(path: str) -> bool:
+    """
+    Writes `path`.gz when compression saves space.
+
+    Returns
+    -------
+    bool
+        Whether the compressed variant was written.
+    """
+
+    if not path.endswith(COMPRESSIBLE_EXTENSIONS) or os.path.getsize(path) < MIN_COMPRESS_SIZE:
+        return False
+
+    with open(path, 'rb') as file:
+        data = file.read()
+    # mtime=0 keeps builds reproducible
+    compressed = gzip.compress(data, compresslevel=9, mtime=0)
+    if len(compressed) >= len(data):
+        return False
+
+    with open(path + '.gz', 'wb') as file:
+        file.write(compressed)
+    shutil.copystat(path, path + '.gz')
+    return True
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    `ManifestStaticFilesStorage` also writing gzip variants of collected files.
+
+    Notes
+    -----
+    - `collectstatic` fails when a stylesheet references a missing file, templates
+      are covered by the `check_static_references` system check.
+    - Without a manifest, e.g. in tests before `collectstatic` ran, URLs aren't fingerprinted.
+    """
+
+    _warned = False
+
+    def post_process(self, paths, dry_run=False, **options):
+        names = set()
+        for name, hashed_name, processed in super().post_process(paths, dry_run, **options):
+            if not isinstance(processed, Exception) and hashed_name:
+                names.update([name, hashed_name])
+            yield name, hashed_name, processed
+
+        if dry_run:
+            return
+
+        for name in sorted(names):
+            if compress(self.path(name)):
+                yield name, name + '.gz', True
+
+    def stored_name(self, name):
+        if not self.hashed_files and not self.manifest_storage.exists(self.manifest_name):
+            if not self._warned:
+                logger.warning('No static files manifest in %s, run collectstatic.', self.location)
+                CompressedManifestStaticFilesStorage._warned = True
+            return name
+        return super().stored_name(name)
+
+
+def template_static_references() -> dict[str, list[str]]:
+    """Returns static paths referenced by `{% static %}` in project templates, by template path."""
+
+    base_dir = str(settings.BASE_DIR)
+    references = {}
+    for engine in engines.all():
+        for directory in map(str, getattr(engine, 'template_dirs', [])):
+            # Third-party templates are left to their packages
+            if not directory.startswith(base_dir):
+                continue
+            for root, _, files in os.walk(directory):
+                for file_name in files:
+                    if not file_name.endswith(('.html', '.txt')):
+                        continue
+                    path = os.path.join(root, file_name)
+                    with open(path, encoding='utf-8') as file:
+                        paths = [match['path'] for match in STATIC_TAG_PATTERN.finditer(file.read())]
+                    if paths:
+                        references[path] = paths
+    return references
+
+
+def check_static_references(app_configs=None, **kwargs) -> list[checks.CheckMessage]:
+    """
+    System check verifying that every `{% static %}` path in project templates exists.
+
+    Tagged with 'staticfiles', so it also stops `collectstatic`.
+    """
+
+    errors = []
+    for template, paths in template_static_references().items():
+        for path in paths:
+            if not finders.find(path):
+                errors.append(checks.Error(
+                    f"Static file '{path}' referenced in '{template}' does not exist.",
+                    id='utils.E002',
+                ))
+    return errors
+
+
+class StaticFilesMiddleware:
+    """
+    Serves collected static files from `STATIC_ROOT`, enabled by `STATIC_SERVE`.
+
+    Fingerprinted names get immutable far-future caching, the gzip variant is served to
+    clients accepting it. Comes before session and auth middleware, so static requests skip them.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.STATIC_SERVE:
+            raise MiddlewareNotUsed
+
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+        self.prefix = settings.STATIC_URL if settings.STATIC_URL.startswith('/') else '/' + settings.STATIC_URL
+        self.root = str(settings.STATIC_ROOT)
+        self.immutable = set(getattr(staticfiles_storage, 'hashed_files', {}).values())
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        response = self.serve(request)
+        if response is None:
+            response = self.get_response(request)
+        return response
+
+    async def __acall__(self, request: HttpRequest) -> HttpResponse:
+        response = self.serve(request)
+        if response is None:
+            response = await self.get_response(request)
+        return response
+
+
+    def serve(self, request: HttpRequest) -> HttpResponse | None:
+        """Returns the response for a static file request, None for everything else."""
+
+        if not request.path_info.startswith(self.prefix) or request.method not in ('GET', 'HEAD'):
+            return None
+
+        name = request.path_info[len(self.prefix):]
+        try:
+            path = safe_join(self.root, name)
+        except SuspiciousFileOperation:
+            return None
+        if not os.path.isfile(path):
+            return None
+
+        stat = os.stat(path)
+        if not was_modified_since(request.META.get('HTTP_IF_MODIFIED_SINCE'), stat.st_mtime):
+            response = HttpResponseNotModified()
+        else:
+            content_type, _ = mimetypes.guess_type(path)
+            served = path
+            encoding = None
+            if os.path.exists(path + '.gz') and GZIP_PATTERN.search(request.META.get('HTTP_ACCEPT_ENCODING', '')):
+                served = path + '.gz'
+                encoding = 'gzip'
+
+            response = FileResponse(
+                open(served, 'rb'),
+                content_type=content_type or 'application/octet-stream',
+                filename=os.path.basename(path),
+            )
+            if encoding:
+                response['Content-Encoding'] = encoding
+            response['Last-Modified'] = http_date(stat.st_mtime)
+
+        if path.endswith(COMPRESSIBLE_EXTENSIONS):
+            response['Vary'] = 'Accept-Encoding'
+        response['Cache-Control'] = IMMUTABLE_CACHE_CONTROL if name in self.immutable else MUTABLE_CACHE_CONTROL
+        return response
@@ -0,0 +1,114 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import checks
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+from utils import caches
+
+
+# Fields read by views, templates and password validators, including the password hash
+# behind `get_session_auth_hash`. Anything else is loaded from the database on access.
+SNAPSHOT_FIELDS = (
+    'password', 'username', 'email', 'first_name', 'last_name', 'is_active', 'is_staff', 'is_superuser',
+)
+
+stats = caches.CacheStats('users')
+
+
+def cache_key(user_pk) -> str:
+    return f'user:{user_pk}'
+
+
+def snapshot_attnames(UserModel) -> list[str]:
+    # In model order, as `Model.from_db` expects them
+    return [
+        field.attname for field in UserModel._meta.concrete_fields
+        if field.primary_key or field.attname in SNAPSHOT_FIELDS
+    ]
+
+
+def is_enabled() -> bool:
+    # A snapshot invalidated in one process would stay valid in the others
+    return settings.USER_CACHE_ENABLED and caches.is_shared()
+
+
+def get_user(user_pk):
+    """
+    Returns the user with the given primary key, from a cached snapshot when there is one.
+
+    Parameters
+    ----------
+    user_pk
+        Primary key of the user, as stored in the session.
+
+    Returns
+    -------
+    User or None
+        The user, None when it doesn't exist.
+
+    Notes
+    -----
+    - Snapshots are kept in the cache backend for `USER_CACHE_TIMEOUT` seconds, with
+      `USER_CACHE_ENABLED` on and a cache backend shared by all processes. Otherwise every
+      call loads the user.
+    - Users are loaded from the primary, a lagging replica could still hold a changed
+      password and keep ended sessions alive.
+    - Users built from a snapshot have every field outside of `SNAPSHOT_FIELDS` deferred,
+      `save()` then only writes the snapshot fields.
+    """
+
+    UserModel = get_user_model()
+    enabled = is_enabled()
+    if enabled:
+        snapshot = cache.get(cache_key(user_pk))
+        if snapshot is not None:
+            stats.hit()
+            # Marked as loaded from the primary, where saves go, so `save()` keeps to the loaded fields
+            return UserModel.from_db(DEFAULT_DB_ALIAS, snapshot_attnames(UserModel), snapshot)
+        stats.miss()
+
+    try:
+        user = UserModel._default_manager.using(DEFAULT_DB_ALIAS).get(pk=user_pk)
+    except UserModel.DoesNotExist:
+        return None
+    if not enabled:
+        return user
+
+    snapshot = [getattr(user, name) for name in snapshot_attnames(UserModel)]
+    cache.set(cache_key(user_pk), snapshot, settings.USER_CACHE_TIMEOUT)
+    return user
+
+
+def invalidate(*user_pks) -> None:
+    """
+    Drops cached snapshots of the given users.
+
+    Within a transaction they are dropped again on commit, a request may cache the
+    old row in between.
+    """
+
+    if not user_pks:
+        return
+
+    keys = [cache_key(pk) for pk in user_pks]
+    cache.delete_many(keys)
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def check_shared_cache(app_configs=None, **kwargs) -> list[checks.CheckMessage]:
+    """
+    System check refusing `USER_CACHE_ENABLED` with a cache backend local to each process.
+    """
+
+    if settings.USER_CACHE_ENABLED and not caches.is_shared():
+        return [checks.Error(
+            'USER_CACHE_ENABLED needs a cache backend shared by all processes.',
+            hint=(
+                'Snapshots dropped in one process would stay cached in the others, so e.g. sessions '
+                'ended by a password change would keep working there. Configure a shared cache, '
+                'such as Redis or Memcached, as CACHES["default"].'
+            ),
+            id='utils.E003',
+        )]
+    return []
@@ -1,8 +1,19 @@
-from django.http import HttpRequest
-from django.shortcuts import redirect
+from asgiref.sync import iscoroutinefunction
+from django.apps import apps
+from django.core import checks
+from django.http import HttpRequest, HttpResponse, HttpResponseBase
+from django.shortcuts import redirect, render
+from django.template import TemplateDoesNotExist, loader
+from django.urls import get_resolver
+
+from utils import assets, roles
 
 import functools
-import inspect
+import sys
+
+
+# Templates resolved by `template_view`, keyed by the dotted path of the view
+TEMPLATE_REGISTRY: dict[str, str] = {}
 
 
 def get_template(template_name: str = '', *, path: str = '', app: str) -> str:
@@ -32,7 +43,7 @@ def get_template(template_name: str = '', *, path: str = '', app: str) -> str:
     """
 
     if not template_name:
-        template_name = inspect.stack()[1][3] # Gets name of the function that this was called in
+        template_name = sys._getframe(1).f_code.co_name # Gets name of the function that this was called in
         template_name = template_name.replace('_', '-')
 
     if path:
@@ -44,6 +55,115 @@ def get_template(template_name: str = '', *, path: str = '', app: str) -> str:
     return template
 
 
+def add_preload_header(response: HttpResponse, template: str) -> HttpResponse:
+    # Only pages rendering the template need its stylesheets, not redirects, errors or
+    # values of views called directly
+    if isinstance(response, HttpResponseBase) and response.status_code == 200 and 'Link' not in response:
+        links = assets.preload_header(template)
+        if links:
+            response['Link'] = links
+    return response
+
+
+def template_view(template_name: str = '', *, path: str = '', app: str = ''):
+    """
+    Decorator resolving the template of a view once, when the view is defined.
+
+    Parameters
+    ----------
+    template_name : str, optional
+        The name of the template file without extension. If not provided,
+        the name of the decorated view will be used (default is '').
+    path : str, optional
+        Additional path to be included in the template location (default is '').
+    app : str, optional
+        The name of the Django app where the template is located. If not provided,
+        the label of the app containing the view will be used (default is '').
+
+    Returns
+    -------
+    callable
+        A decorator function for the view.
+
+    Notes
+    -----
+    - The resolved template is passed to the view as the `template` keyword argument.
+    - Works with both sync and async views.
+    - Successful responses get a `Link` header preloading stylesheets the template links, see `utils.assets`.
+    - Follows the same naming rules as `get_template`, but without any frame inspection
+      at request time. Resolved templates are validated by the `check_templates` system check.
+    """
+
+    def decorator(view_func):
+        name = template_name or view_func.__name__.replace('_', '-')
+        label = app or apps.get_containing_app_config(view_func.__module__).label
+        template = get_template(name, path=path, app=label)
+        TEMPLATE_REGISTRY[f'{view_func.__module__}.{view_func.__qualname__}'] = template
+
+        if iscoroutinefunction(view_func):
+            @functools.wraps(view_func)
+            async def wrapper(request: HttpRequest, *args, **kwargs):
+                response = await view_func(request, *args, template=template, **kwargs)
+                return add_preload_header(response, template)
+        else:
+            @functools.wraps(view_func)
+            def wrapper(request: HttpRequest, *args, **kwargs):
+                response = view_func(request, *args, template=template, **kwargs)
+                return add_preload_header(response, template)
+
+        wrapper.template = template
+        return wrapper
+    return decorator
+
+
+async def arender(request: HttpRequest, template_name: str, context: dict = None) -> HttpResponse:
+    """
+    Renders a template from an async view.
+
+    Parameters
+    ----------
+    request : HttpRequest
+        The current request.
+    template_name : str
+        Path to the template.
+    context : dict, optional
+        Template context (default is None).
+
+    Returns
+    -------
+    HttpResponse
+        The rendered response.
+
+    Notes
+    -----
+    - The user is loaded asynchronously first, so templates can access `user` without
+      running a synchronous query inside the event loop.
+    """
+
+    request.user = await request.auser()
+    return render(request, template_name, context)
+
+
+def check_templates(app_configs=None, **kwargs) -> list[checks.CheckMessage]:
+    """
+    System check verifying that every template resolved by `template_view` exists.
+    """
+
+    # Views register their templates when imported by the URLconf
+    get_resolver().url_patterns
+
+    errors = []
+    for view, template in TEMPLATE_REGISTRY.items():
+        try:
+            loader.get_template(template)
+        except TemplateDoesNotExist:
+            errors.append(checks.Error(
+                f"Template '{template}' used by '{view}' does not exist.",
+                id='utils.E001',
+            ))
+    return errors
+
+
 def unauthenticated_only(redirect_to: str = ''):
     """
     Decorator to restrict view access to unauthenticated users only.
@@ -86,29 +206,30 @@ def role_required(allowed_roles: list[str], redirect_to: str = ''):
     -------
     callable
         A decorator function for the view.
+
+    Notes
+    -----
+    - Roles are looked up through `utils.roles.get_roles`, which caches them per user.
     """
 
     def decorator(view_func):
         @functools.wraps(view_func)
         def wrapper(request: HttpRequest, *args, **kwargs):
-            if request.user.groups.exists():
-                roles = [group.name for group in request.user.groups.all()]
-
-            if any(role in roles for role in allowed_roles):
+            if roles.get_roles(request).intersection(allowed_roles):
                 return view_func(request, *args, **kwargs)
             return redirect(redirect_to)
-            
+
         return wrapper
     return decorator
 
 
-def session_required(allowed_sessions: list[str], redirect_to: str = ''):
+def session_required(allowed_sessions: list[str] | str, redirect_to: str = ''):
     """
     Decorator to restrict access to views only for users during specified sessions.
 
     Parameters
     ----------
-    allowed_sessions : list of str
+    allowed_sessions : list of str or str
         List of session names that are allowed to access the view.
     redirect_to : str, optional
         URL to redirect if password reset session key is False (default is '').
@@ -117,7 +238,14 @@ def session_required(allowed_sessions: list[str], redirect_to: str = ''):
     -------
     callable
         A decorator function for the view.
+
+    Notes
+    -----
+    - For one-shot state between two views prefer `utils.flows.flow_required`.
     """
+    if isinstance(allowed_sessions, str):
+        allowed_sessions = [allowed_sessions]
+
     def decorator(view_func):
         @functools.wraps(view_func)
         def wrapper(request: HttpRequest, *args, **kwargs):
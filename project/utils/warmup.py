@@ -0,0 +1,81 @@
+from django.conf import settings
+from django.contrib.auth import password_validation
+from django.contrib.auth.hashers import get_hashers, make_password
+from django.template import loader
+from django.urls import get_resolver
+from django.utils.module_loading import import_string
+
+import logging
+import threading
+import time
+
+
+logger = logging.getLogger(__name__)
+
+# Set once the warm-up finished, polled by the readiness endpoint
+READY = threading.Event()
+
+
+def warm_urls():
+    """Imports the URLconf, which also defines every view using `template_view`."""
+
+    get_resolver().url_patterns
+
+
+def warm_templates():
+    """Compiles the base template and every template resolved by `template_view`."""
+
+    from utils.views import TEMPLATE_REGISTRY
+
+    for template in {'global/base.html', *TEMPLATE_REGISTRY.values()}:
+        loader.get_template(template)
+
+
+def warm_password_hashers():
+    """Loads the configured hashers and hashes a throwaway password once."""
+
+    get_hashers()
+    make_password('warm-up')
+
+
+def warm_password_validators():
+    """Instantiates the password validators, `CommonPasswordValidator` loads its password list here."""
+
+    password_validation.get_default_password_validators()
+
+
+def run(steps: list[str] = None) -> None:
+    """
+    Runs the warm-up steps and marks the worker as ready.
+
+    Parameters
+    ----------
+    steps : list of str, optional
+        Dotted paths to the steps to run (default is `WARMUP_STEPS`).
+
+    Notes
+    -----
+    - A failing step is logged and the remaining steps still run, but the worker is never
+      marked as ready, so load balancers keep it out of rotation.
+    """
+
+    steps = settings.WARMUP_STEPS if steps is None else steps
+
+    started = time.perf_counter()
+    failed = []
+    for step in steps:
+        step_started = time.perf_counter()
+        try:
+            import_string(step)()
+        except Exception:
+            logger.exception('Warm-up step %s failed', step)
+            failed.append(step)
+        else:
+            logger.debug('Warm-up step %s took %.1f ms', step, (time.perf_counter() - step_started) * 1000)
+
+    elapsed = (time.perf_counter() - started) * 1000
+    if failed:
+        logger.error('Warm-up failed in %.1f ms, not ready: %s', elapsed, ', '.join(failed))
+        return
+    logger.info('Warm-up finished in %.1f ms', elapsed)
+    READY.set()